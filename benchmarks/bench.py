@@ -0,0 +1,340 @@
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+# The stages measured for every maze size, in the order they run: each stage feeds the next one
+STAGES = ('generate_maze', 'draw_maze', 'edges_to_cells', 'a_star')
+
+# The side of the square mazes measured by default
+DEFAULT_SIZES = (50, 500, 2000)
+
+# The default location of the stored baseline
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.jsonl")
+
+# The fewest runs of each stage, so its median time is not a single noisy sample
+MIN_RUNS = 3
+
+
+class PeakMemory:
+    """
+    Measure the peak memory of a stage. On Linux the peak resident set size of the process is reset before the
+    stage (through /proc/self/clear_refs) and read back after it, which costs nothing while the stage runs. The
+    peak is reported above the resident set size at the start of the stage, i.e. the memory the stage needed on
+    top of what was already allocated (memory reused from earlier stages is not counted). Elsewhere the peak is
+    read from `resource.getrusage`, which never goes down, so only the stages that raise the peak of the whole
+    run get a non-zero value.
+
+    Attributes:
+        peak (int): The peak memory of the last measured stage in bytes.
+    """
+    def __init__(self):
+        self.peak = 0
+        self._start = 0
+        self._proc = os.path.exists("/proc/self/clear_refs") and os.access("/proc/self/clear_refs", os.W_OK)
+
+    def _status(self, field):
+        # Read a memory field of /proc/self/status in bytes
+        with open("/proc/self/status") as status:
+            return int(re.search(field + r":\s+(\d+) kB", status.read()).group(1)) * 1024
+
+    def _max_rss(self):
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024  # bytes on macOS, kilobytes elsewhere
+
+    def __enter__(self):
+        gc.collect()
+        if self._proc:
+            with open("/proc/self/clear_refs", "w") as clear_refs:
+                clear_refs.write("5")  # Reset the peak resident set size
+            self._start = self._status("VmRSS")
+        else:
+            self._start = self._max_rss()
+        return self
+
+    def __exit__(self, *exc_info):
+        peak = self._status("VmHWM") if self._proc else self._max_rss()
+        self.peak = max(0, peak - self._start)
+
+
+def measure(function, repeat=5, budget=2.0):
+    """
+    Time a function and measure its peak memory. The time is the median of at least MIN_RUNS runs, a single run
+    of a busy machine being too noisy to compare to a baseline. More runs are made, up to `repeat`, as long as
+    the runs took less than `budget` seconds in total. The memory is measured on the first run.
+
+    Parameters:
+    function (callable): The stage to run, without arguments.
+    repeat (int): The maximum number of runs, at least MIN_RUNS. Default is 5.
+    budget (float): The total time in seconds after which no more than MIN_RUNS runs are made. Default is 2.
+
+    Returns:
+    value: The value returned by the last run.
+    seconds (float): The median wall-clock time of the runs.
+    runs (int): The number of runs.
+    peak_bytes (int): The peak memory of the first run (see `PeakMemory`).
+    """
+    times = []
+    memory = PeakMemory()
+    while len(times) < max(MIN_RUNS, repeat):
+        if len(times) >= MIN_RUNS and sum(times) > budget:
+            break
+        if not times:
+            with memory:
+                started = time.perf_counter()
+                value = function()
+                elapsed = time.perf_counter() - started
+        else:
+            started = time.perf_counter()
+            value = function()
+            elapsed = time.perf_counter() - started
+        times.append(elapsed)
+    return value, statistics.median(times), len(times), memory.peak
+
+
+def machine():
+    """
+    Describe the machine the benchmarks run on, as times are only comparable on the same machine: its processor,
+    number of CPUs, operating system and Python version.
+
+    Returns:
+    machine (str): The fingerprint of the machine.
+    """
+    processor = platform.processor() or platform.machine()
+    if os.path.exists("/proc/cpuinfo"):
+        with open("/proc/cpuinfo") as cpuinfo:
+            model = re.search(r"model name\s*:\s*(.+)", cpuinfo.read())
+        if model:
+            processor = model.group(1).strip()
+    return "{} x{}, {}, Python {}".format(processor, os.cpu_count(), platform.system(), platform.python_version())
+
+
+def run_size(size, seed=0, cell_size=4, fixtures=None, repeat=5):
+    """
+    Run every stage on a square maze of fixed seed: generate it with `generate.build_maze` (the search of
+    `generate_maze` without its pygame window), render it to a fixture image with `draw_maze`, extract its cells
+    back from the edges of the fixture with `edges_to_cells`, and solve it with `a_star`.
+
+    Parameters:
+    size (int): The number of cells of each side of the maze.
+    seed (int): The seed of the maze. Default is 0.
+    cell_size (int): The size of each cell of the fixture image in pixels. Default is 4.
+    fixtures (str): The directory the fixture images are kept in. Default is None (a temporary directory).
+    repeat (int): The maximum number of runs of each stage (see `measure`). Default is 5.
+
+    Returns:
+    records (list): One dict per stage with its 'stage', maze 'size', number of 'cells', median time in
+                    'seconds' over a number of 'runs', 'peak_bytes' of memory and the 'machine' it ran on.
+    """
+    from rectangular_maze.generate import build_maze
+    from rectangular_maze.draw import draw_maze
+    from rectangular_maze.a_star import a_star
+    from preprocess.pipeline import load_image, detect_edges, remove_padding
+    from preprocess.edges import edges_to_cells
+
+    if fixtures is None:
+        # Render the fixtures to a temporary directory removed afterwards
+        with tempfile.TemporaryDirectory(prefix="maze-bench-") as fixtures:
+            return run_size(size, seed, cell_size, fixtures, repeat)
+    os.makedirs(fixtures, exist_ok=True)
+    fixture = os.path.join(fixtures, "maze_{}x{}_{}.png".format(size, size, seed))
+    results = {}
+
+    def stage(name, function):
+        value, seconds, runs, peak = measure(function, repeat)
+        results[name] = (seconds, runs, peak)
+        return value
+
+    grid, start, end = stage('generate_maze', lambda: build_maze(size, size, rng=random.Random(seed)))
+    stage('draw_maze', lambda: draw_maze(grid, start, end, filename=fixture, cell_size=cell_size))
+
+    # Decoding the fixture and detecting its edges are not part of the stage
+    edges = remove_padding(detect_edges(load_image(fixture)), cell_size)
+    stage('edges_to_cells', lambda: edges_to_cells(edges, cell_size, size, size))
+    del edges
+
+    stage('a_star', lambda: a_star(grid, start, end))
+    del grid
+
+    fingerprint = machine()
+    return [{
+        'stage': name,
+        'size': size,
+        'cells': size * size,
+        'seconds': results[name][0],
+        'runs': results[name][1],
+        'peak_bytes': results[name][2],
+        'machine': fingerprint,
+    } for name in STAGES]
+
+
+def load_results(filename):
+    """
+    Load benchmark results from a JSON lines file, e.g. a stored baseline.
+
+    Parameters:
+    filename (str): The path of the results file.
+
+    Returns:
+    results (dict): The records keyed by (stage, size).
+    """
+    with open(filename) as results:
+        records = [json.loads(line) for line in results if line.strip()]
+    return {(record['stage'], record['size']): record for record in records}
+
+
+def compare(records, baseline, tolerance=0.25, min_slowdown=0.01):
+    """
+    Compare benchmark records to a baseline, in place: each record with a baseline measurement gets the
+    'baseline_seconds' and 'baseline_peak_bytes', the 'time_ratio' to the baseline and whether it 'regressed',
+    i.e. got slower than the baseline by more than the tolerance. Stages of a few milliseconds are too noisy for
+    a ratio alone, so a regression must also be slower by at least `min_slowdown` seconds.
+
+    Parameters:
+    records (list): The benchmark records (see `run_size`).
+    baseline (dict): The baseline records keyed by (stage, size) (see `load_results`).
+    tolerance (float): The fraction of slowdown tolerated. Default is 0.25.
+    min_slowdown (float): The smallest slowdown reported as a regression in seconds. Default is 0.01.
+
+    Returns:
+    regressions (list): The records that regressed.
+    """
+    regressions = []
+    for record in records:
+        reference = baseline.get((record['stage'], record['size']))
+        if reference is None:
+            continue
+        record['baseline_seconds'] = reference['seconds']
+        record['baseline_peak_bytes'] = reference['peak_bytes']
+        record['time_ratio'] = record['seconds'] / max(reference['seconds'], 1e-9)
+        record['regressed'] = (record['time_ratio'] > 1 + tolerance and
+                               record['seconds'] - reference['seconds'] >= min_slowdown)
+        if record['regressed']:
+            regressions.append(record)
+    return regressions
+
+
+def format_seconds(seconds):
+    # Format a duration with a unit suited to its magnitude
+    if seconds < 1e-3:
+        return "{:.0f} us".format(seconds * 1e6)
+    if seconds < 1:
+        return "{:.1f} ms".format(seconds * 1e3)
+    return "{:.2f} s".format(seconds)
+
+
+def format_bytes(size):
+    # Format a memory size with a unit suited to its magnitude
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return "{:.0f} {}".format(size, unit)
+        size /= 1024
+    return "{:.1f} GB".format(size)
+
+
+def summary(records):
+    """
+    Format the results as tables of time and memory per stage and maze size, with the scaling of each stage:
+    the exponent k of the growth of its time with the number of cells N (time ~ N^k) between each pair of
+    consecutive sizes, so 1.0 is linear, and the ratio to the baseline at the largest size.
+
+    Parameters:
+    records (list): The benchmark records (see `run_size` and `compare`).
+
+    Returns:
+    summary (str): The tables.
+    """
+    sizes = sorted({record['size'] for record in records})
+    by_key = {(record['stage'], record['size']): record for record in records}
+    stages = [stage for stage in STAGES if any((stage, size) in by_key for size in sizes)]
+    header = ["{}x{}".format(size, size) for size in sizes]
+
+    lines = []
+    for title, field, form in (("time", 'seconds', format_seconds), ("peak memory", 'peak_bytes', format_bytes)):
+        columns = ["{:<16}".format(title)] + ["{:>12}".format(label) for label in header]
+        if field == 'seconds':
+            columns += ["{:>16}".format("scaling"), "{:>12}".format("vs baseline")]
+        lines.append("".join(columns))
+        for stage in stages:
+            row = [by_key.get((stage, size)) for size in sizes]
+            columns = ["{:<16}".format(stage)]
+            columns += ["{:>12}".format(form(record[field]) if record else "-") for record in row]
+            if field == 'seconds':
+                exponents = []
+                for small, large in zip(row, row[1:]):
+                    if small and large and small['seconds'] > 0 and large['cells'] > small['cells']:
+                        exponents.append("{:.2f}".format(math.log(large['seconds'] / small['seconds']) /
+                                                         math.log(large['cells'] / small['cells'])))
+                columns.append("{:>16}".format("N^" + "/".join(exponents) if exponents else "-"))
+                last = [record for record in row if record and 'time_ratio' in record]
+                ratio = "{:.2f}x{}".format(last[-1]['time_ratio'], " !" if last[-1]['regressed'] else "") if last else "-"
+                columns.append("{:>12}".format(ratio))
+            lines.append("".join(columns))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    """
+    Command line entry point: run the benchmarks, write the results as JSON lines and compare them to the baseline.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark maze generation, rendering, wall extraction and solving.")
+    parser.add_argument("-s", "--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="sides of the square mazes (default: {})".format(" ".join(map(str, DEFAULT_SIZES))))
+    parser.add_argument("--seed", type=int, default=0, help="seed of the mazes (default: 0)")
+    parser.add_argument("--cell-size", type=int, default=4, help="cell size of the fixture images in pixels (default: 4)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="maximum runs of each stage, the median is kept (default: 5, at least {})".format(MIN_RUNS))
+    parser.add_argument("--fixtures", default=None, help="directory of the fixture images (default: a temporary directory)")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline results to compare to (default: benchmarks/baseline.jsonl)")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="slowdown tolerated before a regression is reported (default: 0.25)")
+    parser.add_argument("-o", "--output", default=None, help="JSON lines file of the results (default: standard output)")
+    args = parser.parse_args(argv)
+
+    records = []
+    for size in sorted(args.sizes):
+        print("benchmarking {}x{} mazes...".format(size, size), file=sys.stderr)
+        records += run_size(size, args.seed, args.cell_size, args.fixtures, args.repeat)
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, "w") as baseline:
+            baseline.writelines(json.dumps(record) + "\n" for record in records)
+    elif os.path.exists(args.baseline):
+        # Times are only comparable on the machine the baseline was recorded on
+        baseline = load_results(args.baseline)
+        recorded = {record.get('machine', "unknown") for record in baseline.values()}
+        if recorded == {machine()}:
+            regressions = compare(records, baseline, args.tolerance)
+        else:
+            print("not compared to the baseline, it was recorded on another machine ({}): record one on this machine "
+                  "with --save-baseline".format(", ".join(sorted(recorded))), file=sys.stderr)
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for record in records:
+            output.write(json.dumps(record) + "\n")
+    finally:
+        if args.output:
+            output.close()
+
+    print(summary(records), file=sys.stderr)
+    for record in regressions:
+        print("regression: {} at {}x{} took {} ({:.2f}x the baseline)".format(
+            record['stage'], record['size'], record['size'], format_seconds(record['seconds']), record['time_ratio']),
+            file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
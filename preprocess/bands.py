@@ -0,0 +1,298 @@
+import os
+import numpy as np
+from rectangular_maze.maze import Maze
+from rectangular_maze.png import PNGReader
+from .edges import edges_to_walls_at
+from .geometry import line_profiles, geometry_from_profiles
+from .pipeline import load_image, detect_edges, edge_lines
+from .sampling import segment_fractions, sample_walls, is_clean_render
+
+class RowReader:
+    """
+    Read the rows of a maze image in increasing order, without decoding the whole image at once.
+
+    NumPy arrays (including memory maps) and .npy files are sliced directly, .npy files being memory-mapped.
+    Lists of chunks of consecutive rows are read forward, the chunks before the start row being dropped.
+    Binary PGM/PPM files are memory-mapped as well. 8-bit PNG files are decompressed row by row, only the rows
+    between the last requested start row and the last requested stop row are kept. Any other format, including
+    the PNG files that cannot be streamed (16-bit, 1-bit or interlaced), is decoded as a whole by OpenCV. Color
+    rows are returned in BGR order, like `cv2.imread`.
+
+    Attributes:
+        height (int): The height of the image in pixels.
+        width (int): The width of the image in pixels.
+        streamed (bool): Whether the image is decoded as its rows are read (PNG files), so it can only be
+                         read forward.
+    """
+    def __init__(self, image):
+        """
+        Open the image.
+
+        Parameters:
+        image (str, np.ndarray or list): The path of the maze image, the image itself, or a list of chunks of
+                                         its consecutive rows.
+        """
+        self._png = None
+        self._array = None
+        self._chunks = None
+        self._first = 0  # First row kept of streamed images and chunk lists
+        if isinstance(image, str):
+            extension = os.path.splitext(image)[1].lower()
+            if extension == ".png":
+                try:
+                    self._png = PNGReader(image)
+                except ValueError:
+                    # 16-bit, 1-bit and interlaced files cannot be streamed, they are decoded as a whole by OpenCV
+                    self._array = load_image(image)
+            elif extension == ".npy":
+                self._array = np.load(image, mmap_mode="r")
+            elif extension in (".pgm", ".ppm"):
+                self._array = _map_pnm(image)
+            else:
+                self._array = load_image(image)
+            if self._png is None and self._array is None:
+                raise ValueError("could not decode the maze image")
+        elif isinstance(image, list):
+            self._chunks = list(image)
+        else:
+            self._array = image
+
+        self.streamed = self._png is not None
+        if self._png is not None:
+            self.height, self.width = self._png.height, self._png.width
+            self._rows = None  # Decoded rows kept in memory, the first one is row self._first
+        elif self._chunks is not None:
+            self.height, self.width = sum(len(chunk) for chunk in self._chunks), self._chunks[0].shape[1]
+        else:
+            self.height, self.width = self._array.shape[:2]
+
+    def read(self, start, stop):
+        """
+        Read rows [start, stop) of the image. The start row must never go back, as the previous rows of
+        streamed images are dropped.
+
+        Parameters:
+        start (int): The first row.
+        stop (int): The row after the last row, clipped to the height of the image.
+
+        Returns:
+        rows (np.ndarray): The rows of the image.
+        """
+        stop = min(stop, self.height)
+        if self._chunks is not None:
+            return self._read_chunks(start, stop)
+        if self._png is None:
+            return self._array[start:stop]
+
+        if start < self._first:
+            raise ValueError("row {} was already dropped".format(start))
+        # Drop the rows before the start row and decode the rows up to the stop row
+        if self._rows is not None:
+            self._rows = self._rows[start - self._first:]
+        self._first = start
+        while self._png.rows_read < stop:
+            rows = self._png.read_rows(stop - self._png.rows_read)
+            if rows.ndim == 3 and rows.shape[2] in (3, 4):
+                rows[..., :3] = rows[..., 2::-1]  # RGB to BGR
+            skipped = self._first - (self._png.rows_read - len(rows))
+            if skipped > 0:
+                rows = rows[skipped:]  # Rows before the start row
+            self._rows = rows if self._rows is None else np.concatenate((self._rows, rows))
+        return self._rows[:stop - start]
+
+    def _read_chunks(self, start, stop):
+        # Drop the chunks before the start row, and join the parts of the chunks up to the stop row, only rows
+        # spanning several chunks are copied
+        while self._chunks and self._first + len(self._chunks[0]) <= start:
+            self._first += len(self._chunks.pop(0))
+        if start < self._first:
+            raise ValueError("row {} was already dropped".format(start))
+        parts, top = [], self._first
+        for chunk in self._chunks:
+            if top >= stop:
+                break
+            parts.append(chunk[max(0, start - top):stop - top])
+            top += len(chunk)
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def close(self):
+        """
+        Close the image file.
+        """
+        if self._png is not None:
+            self._png.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _map_pnm(filename):
+    # Memory-map the pixels of a binary 8-bit PGM (P5) or PPM (P6) file, after its text header
+    with open(filename, "rb") as file:
+        header = file.read(512)
+    tokens, position = [], 0
+    while len(tokens) < 4:
+        # Skip whitespace and comments, then read the next token
+        while header[position:position + 1].isspace() or header[position:position + 1] == b"#":
+            if header[position:position + 1] == b"#":
+                position = header.index(b"\n", position)
+            position += 1
+        end = position
+        while not header[end:end + 1].isspace():
+            end += 1
+        tokens.append(header[position:end])
+        position = end
+    magic, width, height, maxval = tokens[0], int(tokens[1]), int(tokens[2]), int(tokens[3])
+    if magic not in (b"P5", b"P6") or maxval > 255:
+        raise ValueError("only binary 8-bit PGM and PPM files can be memory-mapped")
+    shape = (height, width) if magic == b"P5" else (height, width, 3)
+    pixels = np.memmap(filename, dtype=np.uint8, mode="r", offset=position + 1, shape=shape)
+    return pixels if magic == b"P5" else pixels[..., ::-1]  # RGB to BGR
+
+
+class BandedMaze:
+    """
+    Extract the walls of a maze image band by band, so the edges of the whole image never have to be held
+    in memory: peak memory is proportional to the height of a band rather than to the height of the image.
+
+    The geometry of the grid is detected first, from the projection profiles accumulated over a first pass on the
+    image (see `geometry.detect_geometry`). Streamed images are decoded again for the bands, unless the rows decoded
+    by that pass fit in `cache_bytes` (opt-in, as they all stay in memory). Then each band of `band_cells`
+    rows of cells goes through edge detection with `overlap` extra rows of pixels above and below it, so the edges
+    along the seams are the same as if the whole image was processed at once. Clean renders can skip edge
+    detection: only the grid lines of each band are binarized and sampled (see `sampling.sample_walls`).
+
+    Attributes:
+        mode (str): How the walls are extracted, 'threshold' or 'canny'.
+        geometry (GridGeometry): The geometry of the grid.
+        cell_size (int): The size of each cell in pixels, rounded.
+        width_cell_count (int): The number of cells horizontally in the maze.
+        height_cell_count (int): The number of cells vertically in the maze.
+    """
+    def __init__(self, image, band_cells=64, overlap=16, low_threshold=50, high_threshold=150, mode='canny',
+                 geometry=None, cache_bytes=0):
+        """
+        Open the image and detect the geometry of its grid.
+
+        Parameters:
+        image (str or np.ndarray): The path of the maze image, or the image itself (a memory map works).
+        band_cells (int): The number of rows of cells in each band. Default is 64.
+        overlap (int): The number of extra rows of pixels around each band for edge detection. Default is 16.
+        low_threshold (int): The low threshold of the Canny edge detection. Default is 50.
+        high_threshold (int): The high threshold of the Canny edge detection. Default is 150.
+        mode (str): 'threshold' to sample the grid lines, 'canny' to detect the edges, or 'auto' to sample the
+                    grid lines if the first band looks like a clean render (see `sampling.is_clean_render`).
+                    Default is 'canny'.
+        geometry (GridGeometry): The geometry of the grid if it is already known, the first pass over the image
+                                 is then skipped. Default is None.
+        cache_bytes (int): The largest size of the decoded rows of a streamed image kept from the first pass for
+                           the bands, it is decoded again if they are larger. Default is 0 (not kept).
+        """
+        self.band_cells = max(1, int(band_cells))
+        self.overlap = overlap
+        self.thresholds = (low_threshold, high_threshold)
+
+        self.reader = RowReader(image)
+        if geometry is None:
+            # Accumulate the projection profiles over a first pass on the image, keeping the decoded rows of
+            # streamed images as long as they fit in the cache
+            cached = [] if self.reader.streamed and cache_bytes > 0 else None
+            size = 0
+
+            def chunks():
+                nonlocal cached, size
+                for top in range(0, self.reader.height, 256):
+                    chunk = self.reader.read(top, top + 256)
+                    if cached is not None:
+                        size += chunk.nbytes
+                        if size <= cache_bytes:
+                            cached.append(chunk)
+                        else:
+                            cached = None
+                    yield chunk
+
+            geometry = geometry_from_profiles(*line_profiles(chunks()))
+            if self.reader.streamed:
+                # Read the bands from the kept rows, or decode the image again if they did not fit
+                self.reader.close()
+                self.reader = RowReader(image if cached is None else cached)
+        self.geometry = geometry
+        self.cell_size = geometry.cell_size
+        self.width_cell_count = geometry.width_cell_count
+        self.height_cell_count = geometry.height_cell_count
+
+        self.mode = mode
+        if mode == 'auto':
+            # Sample the grid lines of the first band to check whether the image is a clean render. The band is
+            # read from the first row the Canny bands start at, as streamed images can only be read forward
+            rows = geometry.row_lines()[:self.band_cells + 1]
+            top = max(0, edge_lines(geometry)[0][0] - self.overlap)
+            pixels = self.reader.read(top, rows[-1] + 1)
+            clean = is_clean_render(*segment_fractions(pixels, rows - top, geometry.column_lines()))
+            self.mode = 'threshold' if geometry.confidence >= 0.5 and clean else 'canny'
+
+    def wall_bands(self, threshold=0.7):
+        """
+        Extract the walls band by band. Can only be iterated once, as streamed images are read forward.
+
+        Parameters:
+        threshold (float): The fraction of edge (dark) pixels along a border for it to be a wall. Default is 0.7.
+
+        Yields:
+        row (int), walls (np.ndarray): The index of the first row of cells of the band, and the
+                                       (rows, width_cell_count) uint8 wall bitmask of the band.
+        """
+        if self.mode == 'threshold':
+            rows, cols = self.geometry.row_lines(), self.geometry.column_lines()
+            overlap = 0
+        else:
+            rows, cols = edge_lines(self.geometry)
+            overlap = self.overlap
+
+        for row in range(0, self.height_cell_count, self.band_cells):
+            # The borders of the band, from the top border of its first row of cells to the bottom border of its last
+            lines = rows[row:row + self.band_cells + 1]
+            top = max(0, lines[0] - overlap)
+            pixels = self.reader.read(top, lines[-1] + 1 + overlap)
+
+            if self.mode == 'threshold':
+                walls = sample_walls(pixels, lines - top, cols, threshold)
+            else:
+                # Detect the edges with some overlap, so they are the same as on the whole image
+                edges = detect_edges(pixels, *self.thresholds)
+                walls = edges_to_walls_at(edges, lines - top, cols, self.geometry.cell_width,
+                                          self.geometry.cell_height, threshold)
+            yield row, walls
+
+    def to_maze(self, threshold=0.7, out=None):
+        """
+        Assemble the walls of all the bands into a Maze.
+
+        Parameters:
+        threshold (float): The fraction of edge pixels along a border for it to be a wall. Default is 0.7.
+        out (np.ndarray): The (height_cell_count, width_cell_count) uint8 array to fill with the walls,
+                          a memory map for instance. A new array is created if None. Default is None.
+
+        Returns:
+        maze (Maze): The maze backed by the wall bitmask.
+        """
+        if out is None:
+            out = np.zeros((self.height_cell_count, self.width_cell_count), dtype=np.uint8)
+        for row, walls in self.wall_bands(threshold):
+            out[row:row + len(walls)] = walls
+        return Maze(self.width_cell_count, self.height_cell_count, out)
+
+    def close(self):
+        """
+        Close the image file.
+        """
+        self.reader.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,234 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from rectangular_maze.solvers import SOLVERS
+
+# File extensions picked up when a directory is given
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.pgm', '.ppm', '.npy')
+
+
+def find_images(source):
+    """
+    List the maze images to solve.
+
+    Parameters:
+    source (str or list): A directory (every image in it, sorted by name), a glob pattern ('**' matches
+                          subdirectories), or a list of paths.
+
+    Returns:
+    paths (list): The paths of the images.
+    """
+    if not isinstance(source, str):
+        return list(source)
+    if os.path.isdir(source):
+        names = sorted(name for name in os.listdir(source) if name.lower().endswith(IMAGE_EXTENSIONS))
+        return [os.path.join(source, name) for name in names]
+    return sorted(glob.glob(source, recursive=True))
+
+
+def solve_file(path, render_dir=None, mode='auto', band_cells=None, solver='a_star'):
+    """
+    Solve a single maze image with `pipeline.solve_image` and summarize the result. Any error is caught and
+    reported in the result, so one bad file does not stop a batch.
+
+    Parameters:
+    path (str): The path of the maze image.
+    render_dir (str): The directory to render the solved maze to, as <name>_solved.png. Rendering is skipped if None.
+    mode (str): How the walls are extracted, see `pipeline.solve_image`. Default is 'auto'.
+    band_cells (int): Process the image in bands, see `pipeline.solve_image`. Default is None.
+    solver (str): The name of the maze solver, see `pipeline.solve_image`. Default is 'a_star'.
+
+    Returns:
+    result (dict): The 'file', whether it was solved ('ok'), and either the 'error', or the maze 'width' and
+                   'height' in cells, the 'cell_size', the 'start' and 'end' (x, y) cells, the 'path_length'
+                   in cells (None if there is no path), the 'nodes_expanded' by the solver, the 'render' file
+                   and the 'timings' in seconds.
+    """
+    from .pipeline import solve_image
+
+    started = time.perf_counter()
+    try:
+        render = None
+        if render_dir is not None:
+            os.makedirs(render_dir, exist_ok=True)
+            name = os.path.splitext(os.path.basename(path))[0]
+            render = os.path.join(render_dir, name + "_solved.png")
+        result = solve_image(path, render=render, mode=mode, band_cells=band_cells, solver=solver)
+    except Exception as error:
+        return {
+            'file': path,
+            'ok': False,
+            'error': "{}: {}".format(type(error).__name__, error),
+            'timings': {'total': time.perf_counter() - started},
+        }
+
+    start, end, solution = result['start'], result['end'], result['path']
+    timings = dict(result['timings'], total=time.perf_counter() - started)
+    return {
+        'file': path,
+        'ok': True,
+        'width': result['width_cell_count'],
+        'height': result['height_cell_count'],
+        'cell_size': result['cell_size'],
+        'start': None if start is None else [start.x, start.y],
+        'end': None if end is None else [end.x, end.y],
+        'path_length': None if solution is None else len(solution),
+        'nodes_expanded': result['nodes_expanded'],
+        'render': render,
+        'timings': timings,
+    }
+
+
+def solve_chunk(paths, render_dir=None, mode='auto', band_cells=None, solver='a_star'):
+    """
+    Solve a chunk of maze images in a worker process. See `solve_file`.
+
+    Returns:
+    results (list): The result of each image, in order.
+    """
+    return [solve_file(path, render_dir, mode, band_cells, solver) for path in paths]
+
+
+def _init_worker():
+    # Every worker solves its own images, OpenCV's own threads would only compete with the other workers
+    import cv2
+    cv2.setNumThreads(1)
+
+
+def solve_isolated(paths, render_dir=None, mode='auto', band_cells=None, solver='a_star'):
+    """
+    Solve maze images one at a time in a single worker process, after a worker died. Only one image is in flight,
+    so an image that kills the worker is the one to blame: it is reported as failed and the worker is replaced
+    for the next images. See `solve_file`.
+
+    Returns:
+    results (list): The result of each image, in order.
+    """
+    results = []
+    executor = None
+    try:
+        for path in paths:
+            if executor is None:
+                executor = ProcessPoolExecutor(1, initializer=_init_worker)
+            started = time.perf_counter()
+            try:
+                results += executor.submit(solve_chunk, [path], render_dir, mode, band_cells, solver).result()
+            except BrokenProcessPool:
+                results.append({
+                    'file': path,
+                    'ok': False,
+                    'error': "BrokenProcessPool: the worker process died while solving this image",
+                    'timings': {'total': time.perf_counter() - started},
+                })
+                executor.shutdown(wait=True)
+                executor = None
+    finally:
+        if executor is not None:
+            executor.shutdown(wait=True)
+    return results
+
+
+def solve_batch(source, workers=None, chunk_size=8, render_dir=None, mode='auto', band_cells=None, solver='a_star'):
+    """
+    Solve many maze images across a pool of worker processes, and stream the results back in the order of the
+    images as soon as they are available.
+
+    The images are submitted in chunks of `chunk_size` files, so each worker gets a batch of work per round trip,
+    and only a couple of chunks per worker are in flight at any time, so huge batches do not queue up in memory.
+    Errors are caught per file (see `solve_file`). If a worker process dies (out of memory, for instance), the
+    whole pool is broken and there is no telling which chunk killed it: the chunks that were already finished are
+    kept, the images of the other chunks in flight are solved again one at a time (see `solve_isolated`), so only
+    an image that kills a worker on its own is reported as failed, and the remaining chunks go to a new pool.
+
+    Parameters:
+    source (str or list): The directory, glob pattern or list of paths of the images (see `find_images`).
+    workers (int): The number of worker processes. Default is None (one per CPU core).
+    chunk_size (int): The number of images submitted to a worker at once, at least 1. Default is 8.
+    render_dir (str): The directory to render the solved mazes to, rendering is skipped if None. Default is None.
+    mode (str): How the walls are extracted, see `pipeline.solve_image`. Default is 'auto'.
+    band_cells (int): Process the images in bands, see `pipeline.solve_image`. Default is None.
+    solver (str): The name of the maze solver, see `pipeline.solve_image`. Default is 'a_star'.
+
+    Yields:
+    result (dict): The result of each image, see `solve_file`.
+    """
+    paths = find_images(source)
+    chunk_size = max(1, int(chunk_size))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    options = (render_dir, mode, band_cells, solver)
+
+    executor = ProcessPoolExecutor(workers, initializer=_init_worker)
+    try:
+        pending = deque()  # (chunk, future, or the list of results of a recovered chunk) in submission order
+        next_chunk = 0
+        while pending or next_chunk < len(chunks):
+            # Keep two chunks per worker in flight
+            while next_chunk < len(chunks) and len(pending) < 2 * workers:
+                chunk = chunks[next_chunk]
+                pending.append((chunk, executor.submit(solve_chunk, chunk, *options)))
+                next_chunk += 1
+
+            chunk, future = pending[0]
+            if isinstance(future, list):
+                results = future
+            else:
+                try:
+                    results = future.result()
+                except BrokenProcessPool:
+                    # A worker died: keep the chunks that finished, solve the others again one image at a time
+                    executor.shutdown(wait=True)
+                    recovered = deque()
+                    for other, other_future in pending:
+                        if isinstance(other_future, list) or (other_future.done() and not other_future.cancelled()
+                                                              and other_future.exception() is None):
+                            recovered.append((other, other_future))
+                        else:
+                            recovered.append((other, solve_isolated(other, *options)))
+                    pending = recovered
+                    executor = ProcessPoolExecutor(workers, initializer=_init_worker)
+                    continue
+            pending.popleft()
+            for result in results:
+                yield result
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def main(argv=None):
+    """
+    Command line entry point: solve the maze images and write one JSON line per image, in order.
+    """
+    parser = argparse.ArgumentParser(description="Solve a batch of maze images across worker processes.")
+    parser.add_argument("source", help="a directory of maze images or a glob pattern (quote it)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=8, help="images submitted to a worker at once (default: 8)")
+    parser.add_argument("--render", metavar="DIR", default=None, help="render the solved mazes to this directory")
+    parser.add_argument("--mode", choices=("auto", "threshold", "canny"), default="auto", help="wall extraction mode")
+    parser.add_argument("--band-cells", type=int, default=None, help="process huge images in bands of this many cell rows")
+    parser.add_argument("--solver", choices=sorted(SOLVERS), default="a_star", help="maze solver (default: a_star)")
+    parser.add_argument("-o", "--output", default=None, help="the JSON lines file to write (default: standard output)")
+    args = parser.parse_args(argv)
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    failed = 0
+    try:
+        for result in solve_batch(args.source, args.workers, args.chunk_size, args.render, args.mode, args.band_cells,
+                                  args.solver):
+            failed += not result['ok']
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
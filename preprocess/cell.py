@@ -1,5 +1,3 @@
-import random
-import pygame
 from .settings import BLACK, RED, WHITE, GREEN, BLUE, YELLOW, PURPLE, color_dict
 
 class Cell:
@@ -41,6 +39,8 @@ class Cell:
         self.f = self.g + self.h  # f = g + h
 
     def draw(self, screen, color_dict, cell_size):
+        import pygame
+
         x, y = self.x * cell_size, self.y * cell_size
         color = color_dict[self.status] if self.status else color_dict['default']
         pygame.draw.rect(screen, color, (x, y, cell_size, cell_size))
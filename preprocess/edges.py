@@ -0,0 +1,95 @@
+import numpy as np
+from rectangular_maze import instrument
+from rectangular_maze.maze import Maze, TOP, RIGHT, BOTTOM, LEFT
+from .cell import Cell
+
+def edges_to_walls(edges, cell_size, width_cell_count, height_cell_count, threshold=0.7):
+    """
+    Compute the walls of every cell of the maze at once from the edges of the maze image (without padding).
+    A border of a cell is a wall when at least `threshold` of its cell_size pixels are edge pixels (255).
+    See `edges_to_walls_at`.
+
+    Parameters:
+    edges (np.ndarray): The edges of the maze image, with the padding removed.
+    cell_size (int): The size of each cell in pixels.
+    width_cell_count (int): The number of cells horizontally in the maze.
+    height_cell_count (int): The number of cells vertically in the maze.
+    threshold (float): The fraction of edge pixels along a border for it to be a wall. Default is 0.7.
+
+    Returns:
+    walls (np.ndarray): The (height_cell_count, width_cell_count) uint8 wall bitmask.
+    """
+    # Pixel coordinates of the top (left) border of each cell, the bottom (right) border of a cell being the top
+    # (left) border of the next one, clipped to avoid out-of-bound indices
+    rows = np.minimum(np.arange(height_cell_count + 1) * cell_size, edges.shape[0] - 1)
+    cols = np.minimum(np.arange(width_cell_count + 1) * cell_size, edges.shape[1] - 1)
+    return edges_to_walls_at(edges, rows, cols, cell_size, cell_size, threshold)
+
+
+def edges_to_walls_at(edges, rows, cols, cell_width, cell_height, threshold=0.7):
+    """
+    Compute the walls of every cell of the maze at once from the edges of the maze image, given the pixel rows
+    and columns of the cell borders in the edges (see `pipeline.edge_lines`). A border of a cell is a wall when
+    at least `threshold` of its cell_width (cell_height) pixels are edge pixels (255).
+
+    Instead of slicing the four borders of each cell in Python, the rows and columns of pixels lying on the cell
+    borders are gathered once, and the edge pixels along each border are counted with a cumulative sum,
+    so the whole grid is processed in a handful of NumPy operations.
+
+    Parameters:
+    edges (np.ndarray): The edges of the maze image.
+    rows (np.ndarray): The pixel rows of the horizontal cell borders (height_cell_count + 1 of them).
+    cols (np.ndarray): The pixel columns of the vertical cell borders (width_cell_count + 1 of them).
+    cell_width (float): The width of each cell in pixels.
+    cell_height (float): The height of each cell in pixels.
+    threshold (float): The fraction of edge pixels along a border for it to be a wall. Default is 0.7.
+
+    Returns:
+    walls (np.ndarray): The (height_cell_count, width_cell_count) uint8 wall bitmask.
+    """
+    top_rows, bottom_rows = rows[:-1], rows[1:]
+    left_cols, right_cols = cols[:-1], cols[1:]
+
+    def horizontal_counts(rows):
+        # Count the edge pixels of each cell's segment [left, right) along the given rows
+        prefix = np.zeros((len(rows), edges.shape[1] + 1), dtype=np.int32)
+        np.cumsum(edges[rows] == 255, axis=1, out=prefix[:, 1:])
+        return prefix[:, right_cols] - prefix[:, left_cols]
+
+    def vertical_counts(cols):
+        # Count the edge pixels of each cell's segment [top, bottom) along the given columns
+        prefix = np.zeros((edges.shape[0] + 1, len(cols)), dtype=np.int32)
+        np.cumsum(edges[:, cols] == 255, axis=0, out=prefix[1:])
+        return prefix[bottom_rows] - prefix[top_rows]
+
+    # Set the wall bits based on edge data, with the minimum number of edge pixels along a border for it to be a wall
+    walls = np.zeros((len(top_rows), len(left_cols)), dtype=np.uint8)
+    walls[horizontal_counts(top_rows) >= threshold * cell_width] |= TOP
+    walls[horizontal_counts(bottom_rows) >= threshold * cell_width] |= BOTTOM
+    walls[vertical_counts(left_cols) >= threshold * cell_height] |= LEFT
+    walls[vertical_counts(right_cols) >= threshold * cell_height] |= RIGHT
+    return walls
+
+
+def edges_to_maze(edges, cell_size, width_cell_count, height_cell_count, threshold=0.7):
+    """
+    Build a Maze from the edges of the maze image (without padding). See `edges_to_walls`.
+
+    Returns:
+    maze (Maze): The maze backed by the wall bitmask.
+    """
+    walls = edges_to_walls(edges, cell_size, width_cell_count, height_cell_count, threshold)
+    return Maze(width_cell_count, height_cell_count, walls)
+
+
+@instrument.traced('edges_to_cells')
+def edges_to_cells(edges, cell_size, width_cell_count, height_cell_count, threshold=0.7):
+    """
+    Build a 2D grid of cells from the edges of the maze image (without padding). See `edges_to_walls`.
+
+    Returns:
+    grid (2D list of Cell): The grid representing the maze.
+    """
+    grid = edges_to_maze(edges, cell_size, width_cell_count, height_cell_count, threshold).to_grid(Cell)
+    instrument.count('edges_to_cells', 'cells', width_cell_count * height_cell_count)
+    return grid
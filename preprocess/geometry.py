@@ -0,0 +1,176 @@
+import numpy as np
+from .sampling import shade
+
+class GridGeometry:
+    """
+    The geometry of the grid of a maze image: where its grid lines are, in pixels.
+
+    Vertical grid line k (k = 0..width_cell_count) lies on pixel column round(origin_x + k * cell_width) and
+    horizontal grid line k (k = 0..height_cell_count) on pixel row round(origin_y + k * cell_height). The pitch
+    is fractional for scaled images, and cells do not have to be square.
+
+    Attributes:
+        cell_width (float): The horizontal distance between grid lines in pixels.
+        cell_height (float): The vertical distance between grid lines in pixels.
+        origin_x (float): The pixel column of the left grid line.
+        origin_y (float): The pixel row of the top grid line.
+        width_cell_count (int): The number of cells horizontally in the maze.
+        height_cell_count (int): The number of cells vertically in the maze.
+        padding (tuple): The number of pixels outside the grid lines on the (left, top, right, bottom) sides.
+        confidence (float): How well the image fits a regular grid, from 0 (not at all) to 1 (perfectly).
+    """
+    def __init__(self, cell_width, cell_height, origin_x, origin_y, width_cell_count, height_cell_count, padding, confidence):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.width_cell_count = width_cell_count
+        self.height_cell_count = height_cell_count
+        self.padding = padding
+        self.confidence = confidence
+
+    @property
+    def cell_size(self):
+        """
+        The size of the cells rounded to a whole number of pixels, to render the maze again.
+        """
+        return max(1, int(round((self.cell_width + self.cell_height) / 2)))
+
+    def row_lines(self):
+        """
+        Returns:
+        rows (np.ndarray): The pixel rows of the height_cell_count + 1 horizontal grid lines.
+        """
+        return np.rint(self.origin_y + np.arange(self.height_cell_count + 1) * self.cell_height).astype(np.int64)
+
+    def column_lines(self):
+        """
+        Returns:
+        cols (np.ndarray): The pixel columns of the width_cell_count + 1 vertical grid lines.
+        """
+        return np.rint(self.origin_x + np.arange(self.width_cell_count + 1) * self.cell_width).astype(np.int64)
+
+    def __repr__(self):
+        return "GridGeometry({:g}x{:g} px cells, {}x{} cells at ({:g}, {:g}), confidence {:.2f})".format(
+            self.cell_width, self.cell_height, self.width_cell_count, self.height_cell_count,
+            self.origin_x, self.origin_y, self.confidence)
+
+
+def line_profiles(chunks, light=240):
+    """
+    Sum the darkness of every row and every column of an image (see `sampling.darkness`), given as chunks of rows,
+    so only one chunk is converted at a time.
+
+    Parameters:
+    chunks (iterable): The consecutive chunks of rows of the image (np.ndarray).
+    light (int): The brightness above which a pixel is background. Default is 240.
+
+    Returns:
+    rows (np.ndarray): The darkness of each row.
+    cols (np.ndarray): The darkness of each column.
+    """
+    rows, cols = [], None
+    for chunk in chunks:
+        dark = shade(chunk, light)
+        rows.append(dark.sum(axis=1, dtype=np.int64))
+        sums = dark.sum(axis=0, dtype=np.int64)
+        cols = sums if cols is None else cols + sums
+    return np.concatenate(rows) / light, cols / light
+
+
+def detect_geometry(image, chunk=256):
+    """
+    Detect the grid of a maze image from the projection profiles of its darkness. The grid lines are the
+    peaks of the row (column) profile: the distance between them gives the pitch, the first and last ones the
+    offset, padding and number of cells. Any cell size, amount of padding or scale works, cells may be
+    rectangular. The cost is a single pass over the pixels, one chunk of rows at a time.
+
+    Parameters:
+    image (np.ndarray): The maze image (dark walls on a light background).
+    chunk (int): The number of rows converted at once. Default is 256.
+
+    Returns:
+    geometry (GridGeometry): The geometry of the grid.
+    """
+    rows, cols = line_profiles((image[top:top + chunk] for top in range(0, image.shape[0], chunk)))
+    return geometry_from_profiles(rows, cols)
+
+
+def geometry_from_profiles(rows, cols):
+    """
+    Detect the grid of a maze image from the projection profiles of its darkness (see `line_profiles`).
+
+    Parameters:
+    rows (np.ndarray): The darkness of each row.
+    cols (np.ndarray): The darkness of each column.
+
+    Returns:
+    geometry (GridGeometry): The geometry of the grid.
+    """
+    origin_y, cell_height, height_cell_count, score_y = _detect_lines(rows)
+    origin_x, cell_width, width_cell_count, score_x = _detect_lines(cols)
+    padding = (
+        int(round(origin_x)),
+        int(round(origin_y)),
+        len(cols) - 1 - int(round(origin_x + width_cell_count * cell_width)),
+        len(rows) - 1 - int(round(origin_y + height_cell_count * cell_height)),
+    )
+    return GridGeometry(cell_width, cell_height, origin_x, origin_y, width_cell_count, height_cell_count,
+                        padding, score_x * score_y)
+
+
+def _detect_lines(profile):
+    # Find the regularly spaced grid lines along one axis of the image from its profile of darkness.
+    # Returns the position of the first line, the pitch, the number of cells and a confidence score
+    profile = np.asarray(profile, dtype=np.float64)
+    if len(profile) < 3 or profile.max() <= 0:
+        raise ValueError("no grid lines were found in the maze image")
+
+    # Remove the slowly varying background of the profile (walls crossing the lines, noise) with a morphological
+    # top-hat: the profile minus its opening by a 5 pixel window, which only keeps the peaks thinner than 5 pixels
+    window = np.lib.stride_tricks.sliding_window_view
+    padded = np.pad(profile, 2, mode="edge")
+    opening = window(np.pad(window(padded, 5).min(axis=1), 2, mode="edge"), 5).max(axis=1)
+    peaks = profile - opening
+
+    # The grid lines are the runs of rows standing out of the background (above the noise, and above a tenth of
+    # the highest peak, which is the outer wall), thick lines are located at their centroid
+    deviation = 1.4826 * np.median(np.abs(peaks - np.median(peaks)))
+    strong = peaks > max(1.0, 3 * deviation, 0.1 * peaks.max())
+    bounds = np.flatnonzero(np.diff(np.concatenate(([0], strong.view(np.int8), [0]))))
+    starts, stops = bounds[::2], bounds[1::2]
+    sums = np.concatenate(([0], np.cumsum(peaks)))
+    moments = np.concatenate(([0], np.cumsum(np.arange(len(peaks)) * peaks)))
+    centers = (moments[stops] - moments[starts]) / (sums[stops] - sums[starts])
+    if len(centers) < 2:
+        raise ValueError("no grid lines were found in the maze image")
+
+    # The pitch is the typical distance between consecutive lines. Lines missing in between (without any wall
+    # along them) make some distances a multiple of it, they are divided back
+    gaps = np.diff(centers)
+    multiples = np.rint(gaps / np.median(gaps))
+    regular = (multiples >= 1) & (np.abs(gaps / np.median(gaps) - multiples) < 0.25)
+    pitch = np.median(gaps[regular] / multiples[regular])
+
+    # Number the lines by rounding each distance to a number of pitches, so a slightly wrong pitch does not
+    # accumulate along the axis, then fit their positions with a regular grid, leaving out the runs not on it
+    indices = np.concatenate(([0], np.cumsum(np.rint(gaps / pitch))))
+    pitch, origin = np.polyfit(indices, centers, 1) if indices[-1] > 0 else (pitch, centers[0])
+    on_grid = np.abs(origin + indices * pitch - centers) < pitch / 4
+    indices, centers = indices[on_grid], centers[on_grid]
+    if len(centers) < 2 or indices[-1] == indices[0]:
+        raise ValueError("no grid lines were found in the maze image")
+    pitch, origin = np.polyfit(indices, centers, 1)
+    if pitch < 2:
+        raise ValueError("no grid lines were found in the maze image")
+    count = int(indices[-1] - indices[0])
+    origin += indices[0] * pitch
+
+    # Confidence: the fraction of the lines of the grid that were found, how closely they fit the grid, and the
+    # fraction of the darkness of the runs that lies on the grid lines
+    found = len(np.unique(indices)) / (count + 1)
+    residual = np.sqrt(np.mean((origin + (indices - indices[0]) * pitch - centers) ** 2))
+    fit = max(0.0, 1 - residual / (pitch / 4))
+    weights = sums[stops] - sums[starts]
+    on_lines = weights[on_grid].sum() / weights.sum()
+    return float(origin), float(pitch), count, found * fit * on_lines
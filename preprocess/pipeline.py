@@ -0,0 +1,228 @@
+import time
+import cv2
+import numpy as np
+from rectangular_maze import instrument, solvers
+from rectangular_maze.maze import Maze
+from .edges import edges_to_walls_at
+from .geometry import detect_geometry
+from .sampling import segment_fractions, fractions_to_walls, is_clean_render
+
+def load_image(file_path):
+    """Load an image from file."""
+    return cv2.imread(file_path, cv2.IMREAD_UNCHANGED)
+
+
+def detect_edges(image, low_threshold=50, high_threshold=150):
+    """Detect edges in an image using the Canny algorithm."""
+    return cv2.Canny(image, low_threshold, high_threshold)
+
+
+def find_cell_size_and_count(edges, chunk=64):
+    """
+    Infer the size of the cells and the number of cells of the maze from its edges, assuming one cell of padding
+    around the maze. See `geometry.detect_geometry` for a detector that makes no such assumption.
+
+    Parameters:
+    edges (np.ndarray): The edges of the maze image.
+    chunk (int): The number of rows searched at once for the first edge pixel. Default is 64.
+
+    Returns:
+    cell_size (int), width_cell_count (int), height_cell_count (int): The size of each cell in pixels and the
+    number of cells horizontally and vertically.
+    """
+    # Find the first edge pixel in the image, a chunk of rows at a time
+    for top in range(0, edges.shape[0], chunk):
+        found = edges[top:top + chunk] == 255
+        rows = np.flatnonzero(found.any(axis=1))
+        if len(rows):
+            row, col = top + int(rows[0]), int(np.argmax(found[rows[0]]))
+            break
+    else:
+        raise ValueError("no edges were found in the maze image")
+
+    # The cell size is the minimum of the row and column indices + 1
+    cell_size = min(row, col) + 1
+
+    # Calculate the image size
+    height, width = edges.shape
+
+    # Calculate cell count in width and height
+    width_cell_count = (width - 2 * cell_size) // cell_size
+    height_cell_count = (height - 2 * cell_size) // cell_size
+
+    return cell_size, width_cell_count, height_cell_count
+
+
+def remove_padding(edges, cell_size):
+    """
+    Crop the padding around the maze from its edges, assuming one cell of padding around the maze. The edges run
+    along both sides of the grid lines; the crop keeps the cell borders on the pixel row above each horizontal line
+    and the pixel column right of each vertical line. See `edge_lines` for the general case.
+
+    Parameters:
+    edges (np.ndarray): The edges of the maze image.
+    cell_size (int): The size of each cell in pixels.
+
+    Returns:
+    edges (np.ndarray): The edges of the maze without the padding.
+    """
+    start_row = cell_size - 1
+    end_row = edges.shape[0] - cell_size
+    start_col = cell_size + 1
+    end_col = edges.shape[1] - cell_size
+    return edges[start_row:end_row, start_col:end_col]
+
+
+def edge_lines(geometry):
+    """
+    Find where the cell borders are in the Canny edges of a maze image, which run along both sides of the grid
+    lines: on the pixel row above each horizontal grid line, and on the pixel column right of each vertical grid
+    line, except for the right border of the maze, which is sampled on the column left of its line. These are the
+    offsets `remove_padding` crops at.
+
+    Parameters:
+    geometry (GridGeometry): The geometry of the grid of the maze image.
+
+    Returns:
+    rows (np.ndarray): The pixel rows of the horizontal cell borders in the edges.
+    cols (np.ndarray): The pixel columns of the vertical cell borders in the edges.
+    """
+    rows = np.maximum(geometry.row_lines() - 1, 0)
+    cols = geometry.column_lines() + 1
+    cols[-1] -= 2
+    return rows, cols
+
+
+def find_start_end(grid):
+    """
+    Finds the start and end cells in the grid based on missing walls.
+
+    Parameters:
+    grid (list or Maze): The 2D grid representing the maze.
+
+    Returns:
+    start (Cell), end (Cell): The start and end cells in the maze, or None if not found.
+    """
+    height = len(grid)
+    width = len(grid[0])
+    start, end = None, None
+
+    # Check top and bottom borders
+    for i in range(width):
+        if not grid[0][i].walls['top']:
+            start = grid[0][i]
+            start.status = 'start'
+        if not grid[height-1][i].walls['bottom']:
+            end = grid[height-1][i]
+            end.status = 'end'
+
+    # Check left and right borders
+    for i in range(height):
+        if not grid[i][0].walls['left']:
+            start = grid[i][0]
+            start.status = 'start'
+        if not grid[i][width-1].walls['right']:
+            end = grid[i][width-1]
+            end.status = 'end'
+
+    return start, end
+
+
+@instrument.traced('solve_image')
+def solve_image(image, solve=True, render=None, band_cells=None, mode='auto', solver='a_star'):
+    """
+    Run the whole image solver pipeline on a maze image: decode -> grid inference -> wall extraction (sampling
+    or edge detection) -> solve -> optional render. Nothing is displayed, so it can be used from a worker process.
+
+    Parameters:
+    image (str or np.ndarray): The path of the maze image, or the already decoded image (decoding is then skipped).
+    solve (bool): Whether to search for the shortest path. Default is True.
+    render (str): The file name to render the maze and its solution to, rendering is skipped if None. Default is None.
+    band_cells (int): Process the image in bands of this many rows of cells (see `bands.BandedMaze`) so huge images
+                      are never decoded as a whole. The whole image is processed at once if None. Default is None.
+    mode (str): How the walls are extracted: 'threshold' samples the binarized grid lines of clean renders
+                (see `sampling.sample_walls`), 'canny' runs edge detection, which also works on noisy or
+                photographed images, and 'auto' samples the walls if the image looks like a clean render and
+                falls back to edge detection otherwise. Default is 'auto'.
+    solver (str): The name of the maze solver (a key of `rectangular_maze.solvers.SOLVERS`). Default is 'a_star'.
+
+    Returns:
+    result (dict): The maze ('grid', a Maze), its 'start' and 'end' cells, the shortest 'path' (None if not solved
+                   or if there is no solution) and the number of 'nodes_expanded' by the solver, the 'geometry' of
+                   the grid (a GridGeometry) with its rounded 'cell_size', 'width_cell_count' and
+                   'height_cell_count', and the 'timings' in seconds of each stage that was run.
+    """
+    timings = {}
+
+    def timed(stage, function, *args, **kwargs):
+        # Run a stage of the pipeline and record its duration, also in the trace if instrumentation is enabled
+        stage_start = time.perf_counter()
+        with instrument.stage('solve_image.' + stage):
+            value = function(*args, **kwargs)
+        timings[stage] = time.perf_counter() - stage_start
+        return value
+
+    if mode not in ('auto', 'canny', 'threshold'):
+        raise ValueError("unknown wall extraction mode {!r}".format(mode))
+    if solver not in solvers.SOLVERS:
+        raise ValueError("unknown maze solver {!r}".format(solver))
+
+    grid = None
+    if band_cells is not None:
+        # Decode the image, detect the edges and extract the walls one band at a time
+        from .bands import BandedMaze
+        with timed('geometry', BandedMaze, image, band_cells, mode=mode) as banded:
+            grid = timed('walls', banded.to_maze)
+        geometry = banded.geometry
+    else:
+        # Decode the image if a path was provided
+        if isinstance(image, str):
+            image = timed('decode', load_image, image)
+            if image is None:
+                raise ValueError("could not decode the maze image")
+
+    if grid is None:
+        # Locate the grid lines from the projection profiles of the image
+        geometry = timed('geometry', detect_geometry, image)
+        rows, cols = geometry.row_lines(), geometry.column_lines()
+
+        if mode != 'canny':
+            # Sample the walls along the grid lines, unless the image does not look like a clean render
+            horizontal, vertical = timed('walls', segment_fractions, image, rows, cols)
+            if mode == 'threshold' or (geometry.confidence >= 0.5 and is_clean_render(horizontal, vertical)):
+                walls = fractions_to_walls(horizontal, vertical)
+                grid = Maze(geometry.width_cell_count, geometry.height_cell_count, walls)
+
+    if grid is None:
+        # Detect the edges and extract the walls of every cell along them
+        edges = timed('edges', detect_edges, image)
+        rows, cols = edge_lines(geometry)
+        walls = timed('walls', edges_to_walls_at, edges, rows, cols, geometry.cell_width, geometry.cell_height)
+        grid = Maze(geometry.width_cell_count, geometry.height_cell_count, walls)
+
+    # Find the entrance and exit
+    start, end = timed('endpoints', find_start_end, grid)
+
+    # Find the shortest path
+    path = nodes_expanded = None
+    if solve and start is not None and end is not None:
+        result = timed('solve', solvers.solve, grid, start, end, solver)
+        path, nodes_expanded = result.path, result.nodes_expanded
+
+    # Draw the maze image with the shortest path
+    if render is not None:
+        from .draw import draw_maze
+        timed('render', draw_maze, grid, start, end, path=path, filename=render, cell_size=geometry.cell_size)
+
+    return {
+        'grid': grid,
+        'start': start,
+        'end': end,
+        'path': path,
+        'nodes_expanded': nodes_expanded,
+        'geometry': geometry,
+        'cell_size': geometry.cell_size,
+        'width_cell_count': geometry.width_cell_count,
+        'height_cell_count': geometry.height_cell_count,
+        'timings': timings,
+    }
@@ -0,0 +1,140 @@
+import numpy as np
+from rectangular_maze.maze import TOP, RIGHT, BOTTOM, LEFT
+
+def darkness(image, light=240):
+    """
+    Measure how dark the pixels of an image decoded by OpenCV (gray, BGR or BGRA) are, from 0 (brightness at
+    `light` and above) to 1 (black). The brightness of a color pixel is its brightest channel raised by its chroma
+    (brightest minus dimmest channel), so saturated colors, like the path and the green and blue markers of
+    rendered mazes, count as background while gray walls keep their level. The gradual scale keeps the thin,
+    anti-aliased lines of scaled images.
+
+    Parameters:
+    image (np.ndarray): The image, or any part of it.
+    light (int): The brightness above which a pixel is background. Default is 240.
+
+    Returns:
+    darkness (np.ndarray): The float32 darkness of each pixel.
+    """
+    return shade(image, light) * np.float32(1 / light)
+
+
+def shade(image, light=240):
+    """
+    Same as `darkness`, as uint8 levels from 0 (background) to `light` (black), which are cheaper to add up.
+    """
+    if image.ndim == 2:
+        value = image
+    else:
+        # The brightest of the color channels raised by the chroma, without overflowing, the alpha channel is
+        # left out
+        brightest = np.maximum(np.maximum(image[..., 0], image[..., 1]), image[..., 2])
+        dimmest = np.minimum(np.minimum(image[..., 0], image[..., 1]), image[..., 2])
+        value = brightest + np.minimum(brightest - dimmest, 255 - brightest)
+    return light - np.minimum(value, np.uint8(light))
+
+
+def segment_fractions(image, rows, cols, light=240):
+    """
+    Measure the fraction of dark pixels along every segment of the grid lines of a rendered maze. Only the rows
+    and columns of pixels lying on the grid lines are read, the inside of the cells is never touched.
+
+    The segment of horizontal grid line k above cell column c covers the pixels of row rows[k] from cols[c] to
+    cols[c + 1]; a margin of a fifth of the cell (at least one pixel) is left out at both ends, where the vertical
+    lines cross, as the lines of scaled images are thicker and blurred. A pixel of a line is dark when the darkness
+    of the three pixels across the line adds up to at least a quarter, so faint lines spread over two pixels by
+    scaling are kept. Vertical grid lines are sampled the same way.
+
+    Parameters:
+    image (np.ndarray): The maze image.
+    rows (np.ndarray): The pixel rows of the horizontal grid lines (height_cell_count + 1 of them).
+    cols (np.ndarray): The pixel columns of the vertical grid lines (width_cell_count + 1 of them).
+    light (int): The brightness above which a pixel is background (see `darkness`). Default is 240.
+
+    Returns:
+    horizontal (np.ndarray): The (height_cell_count + 1, width_cell_count) fractions along the horizontal lines.
+    vertical (np.ndarray): The (height_cell_count, width_cell_count + 1) fractions along the vertical lines.
+    """
+    rows, cols = np.asarray(rows), np.asarray(cols)
+
+    def across(lines, axis):
+        # Gather the pixels of every line and of both sides of it at once (the lines are the rows of the result),
+        # and add up their darkness, the pixels outside the image being background
+        neighbors = lines[:, None] + np.arange(-1, 2)
+        indices = np.clip(neighbors, 0, image.shape[axis] - 1).ravel()
+        if axis == 0:
+            dark = shade(image[indices, cols[0]:cols[-1] + 1], light)
+        else:
+            dark = shade(np.take(image[rows[0]:rows[-1] + 1], indices, axis=1), light).T
+        dark = dark.reshape(len(lines), 3, -1).astype(np.int16)
+        dark[(neighbors < 0) | (neighbors >= image.shape[axis])] = 0
+        return dark.sum(axis=1) >= light / 4
+
+    def fractions(dark, lines):
+        # Count the dark pixels between consecutive lines along the last axis, leaving out the margins
+        margin = max(1, int(round(np.median(np.diff(lines)) / 5)))
+        prefix = np.zeros(dark.shape[:-1] + (dark.shape[-1] + 1,), dtype=np.int32)
+        np.cumsum(dark, axis=-1, out=prefix[..., 1:])
+        starts, stops = lines[:-1] - lines[0] + margin, lines[1:] - lines[0] - margin + 1
+        return (prefix[..., stops] - prefix[..., starts]) / np.maximum(stops - starts, 1)
+
+    # Find the dark pixels along the horizontal lines, and count them along each segment
+    dark = across(rows, 0)
+    horizontal = fractions(dark, cols)
+
+    # Same for the vertical lines, transposed so the lines are the rows
+    dark = across(cols, 1)
+    vertical = fractions(dark, rows).T
+    return horizontal, vertical
+
+
+def fractions_to_walls(horizontal, vertical, threshold=0.5):
+    """
+    Build the wall bitmask from the fractions of dark pixels along the grid line segments (see `segment_fractions`).
+    A segment is a wall of the cells on both of its sides when at least `threshold` of its pixels are dark.
+
+    Parameters:
+    horizontal (np.ndarray): The fractions along the horizontal lines.
+    vertical (np.ndarray): The fractions along the vertical lines.
+    threshold (float): The fraction of dark pixels along a segment for it to be a wall. Default is 0.5.
+
+    Returns:
+    walls (np.ndarray): The (height_cell_count, width_cell_count) uint8 wall bitmask.
+    """
+    horizontal, vertical = horizontal >= threshold, vertical >= threshold
+    walls = np.zeros(vertical[:, :-1].shape, dtype=np.uint8)
+    walls[horizontal[:-1]] |= TOP
+    walls[horizontal[1:]] |= BOTTOM
+    walls[vertical[:, :-1]] |= LEFT
+    walls[vertical[:, 1:]] |= RIGHT
+    return walls
+
+
+def sample_walls(image, rows, cols, threshold=0.5, light=240):
+    """
+    Compute the walls of every cell of a rendered maze by binarizing its grid lines and sampling them at the
+    known positions of the grid, without edge detection. See `segment_fractions` and `fractions_to_walls`.
+
+    Returns:
+    walls (np.ndarray): The (height_cell_count, width_cell_count) uint8 wall bitmask.
+    """
+    horizontal, vertical = segment_fractions(image, rows, cols, light)
+    return fractions_to_walls(horizontal, vertical, threshold)
+
+
+def is_clean_render(horizontal, vertical, tolerance=0.01):
+    """
+    Check whether a maze image looks like a clean render (of `draw_maze`, possibly scaled), so its walls can be
+    sampled directly: almost every grid line segment is either fully dark (a wall) or fully light (an opening).
+    Blurred, noisy or photographed images fail this check.
+
+    Parameters:
+    horizontal (np.ndarray), vertical (np.ndarray): The fractions of dark pixels along the grid line segments.
+    tolerance (float): The fraction of segments allowed to be partly dark. Default is 0.01.
+
+    Returns:
+    clean (bool): Whether the walls can be sampled directly.
+    """
+    partial = np.count_nonzero((horizontal > 0.1) & (horizontal < 0.9))
+    partial += np.count_nonzero((vertical > 0.1) & (vertical < 0.9))
+    return partial <= tolerance * (horizontal.size + vertical.size)
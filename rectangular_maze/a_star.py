@@ -1,46 +1,103 @@
-from .cell import Cell
-from .settings import WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT
+import heapq
+from itertools import count
+from .maze import SolverState, UNSET
+from . import instrument
 
-def a_star(grid, start, end):
+@instrument.traced('a_star')
+def a_star(grid, start, end, state=None, events=None):
     """
     Implements A* algorithm to find the shortest path from the start cell to the end cell.
 
+    The search state (g, h and parent of every cell) is kept in SolverState arrays indexed by cell id 
+    (y * width + x) instead of on the cells, so the grid is never modified. The same grid can answer any 
+    number of queries back to back, or concurrently from threads as long as each thread uses its own state.
+
     Parameters:
-    grid (list): The 2D grid representing the maze.
+    grid (list or Maze): The 2D grid representing the maze.
     start (Cell): The starting cell of the path.
     end (Cell): The ending cell of the path.
+    state (SolverState): An optional state to reuse between queries, it is reset before the search. 
+                         A new one is allocated if None. Default is None.
+    events (list): An optional list the search events are appended to, as (status, x, y) tuples: ('open', x, y) 
+                   when a cell enters the open set and ('closed', x, y) when it is expanded. Default is None.
+
+    While instrumentation is enabled (see `instrument.tracing`), the number of nodes expanded and the peak size 
+    of the open set are reported for the 'a_star' stage.
 
     Returns:
     path (list): The list of cells from the start cell to the end cell, or None if no path is found.
     """
     
-    # Initialize the open list with the start cell
-    open_list = [start]
-    start.g = 0  # The cost from start to start is 0
-    start.calculate_h(end)  # Calculate the heuristic cost from the start to the end cell
+    # Determine the size of the grid
+    height_cell_count = len(grid)
+    width_cell_count = len(grid[0])
+
+    # Prepare the side arrays holding the search state of this query
+    if state is None:
+        state = SolverState(width_cell_count * height_cell_count)
+    else:
+        state.reset()
+    g_costs, parents = state.g, state.parent
+
+    # Manhattan distance to the goal
+    def heuristic(x, y):
+        return abs(end.x - x) + abs(end.y - y)
+
+    # Initialize the open set as a binary heap of (f, h, order, cell) entries with the start cell. The heap 
+    # gives the cell with the lowest total cost in O(log N), ties are broken by the lowest heuristic cost and 
+    # then by insertion order, so the search is deterministic
+    order = count()
+    start_id = start.y * width_cell_count + start.x
+    g_costs[start_id] = 0  # The cost from start to start is 0
+    h = heuristic(start.x, start.y)  # Calculate the heuristic cost from the start to the end cell
+    state.h[start_id] = h
+    open_heap = [(h, h, next(order), start)]
+
+    # Initialize the closed set with the ids of the cells that have already been expanded
+    closed = set()
+
+    # The open set peak is only tracked while instrumentation is enabled
+    trace = instrument.current()
+    open_peak = 1
+
+    def report(found, open_peak):
+        # Report the statistics of the search to the trace, if instrumentation is enabled
+        if trace is not None:
+            trace.count('a_star', 'nodes_expanded', len(closed) + found)
+            trace.peak('a_star', 'open_set_peak', open_peak)
+
+    while open_heap:
+        # Get the cell with the lowest total cost (f) in the open set
+        f, h, _, current = heapq.heappop(open_heap)
+        current_id = current.y * width_cell_count + current.x
+        current_g = int(g_costs[current_id])
 
-    while open_list:
-        # Get the cell with the lowest total cost (f) in the open list
-        current = min(open_list, key=lambda cell: cell.f)
+        # Skip stale entries, the cell has already been expanded or was pushed again with a lower cost
+        if current_id in closed or f != current_g + h:
+            continue
 
         # If the current cell is the end cell, then we have found a solution
-        if current is end:
-            path = []
+        if current.x == end.x and current.y == end.y:
+            path = [current]
             # Traverse back to the start cell through each cell's parent and append each cell to the path
-            while current.parent:
-                path.append(current)
-                current = current.parent
-            path.append(current)
+            parent_id = int(parents[current_id])
+            while parent_id != UNSET:
+                path.append(grid[parent_id // width_cell_count][parent_id % width_cell_count])
+                parent_id = int(parents[parent_id])
+            report(True, open_peak)
             return path[::-1]  # Reverse the path to get the correct order from start to end
 
-        # Remove the current cell from the open list
-        open_list.remove(current)
+        # Move the current cell to the closed set
+        closed.add(current_id)
+        if events is not None:
+            events.append(('closed', current.x, current.y))
 
         # Check each of the current cell's neighbors (right, left, down, up)
         for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
             x, y = current.x + dx, current.y + dy
             # Ensure that the neighbor's coordinates are within the grid
-            if 0 <= x < WIDTH_CELL_COUNT and 0 <= y < HEIGHT_CELL_COUNT:
+            neighbor_id = y * width_cell_count + x
+            if 0 <= x < width_cell_count and 0 <= y < height_cell_count and neighbor_id not in closed:
                 neighbor = grid[y][x]
 
                 # Skip the neighbor if there is a wall between it and the current cell
@@ -58,17 +115,23 @@ def a_star(grid, start, end):
                         continue
 
                 # Calculate the cost (g) from the start cell to the neighbor through the current cell
-                g = current.g + 1
+                g = current_g + 1
 
                 # If this path is shorter (in terms of cost g) than any previous path found to the neighbor,
                 # then this is a new best path and we should record it
-                if g < neighbor.g:
-                    neighbor.g = g
-                    neighbor.calculate_h(end)  # Recalculate the heuristic cost for the neighbor
-                    neighbor.parent = current  # Set the current cell as the neighbor's parent
-                    if neighbor not in open_list:
-                        # If the neighbor is not in the open list, add it
-                        open_list.append(neighbor)
+                neighbor_g = g_costs[neighbor_id]
+                if neighbor_g == UNSET or g < neighbor_g:
+                    g_costs[neighbor_id] = g
+                    h = heuristic(x, y)  # Calculate the heuristic cost for the neighbor
+                    state.h[neighbor_id] = h
+                    parents[neighbor_id] = current_id  # Set the current cell as the neighbor's parent
+                    # Push the neighbor to the open set, any older entry of it becomes stale
+                    heapq.heappush(open_heap, (g + h, h, next(order), neighbor))
+                    if trace is not None and len(open_heap) > open_peak:
+                        open_peak = len(open_heap)
+                    if events is not None and neighbor_g == UNSET:
+                        events.append(('open', x, y))
 
     # If we have checked all possible cells and didn't find a path, then there is no solution
+    report(False, open_peak)
     return None
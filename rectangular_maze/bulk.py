@@ -0,0 +1,120 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from .generators import GENERATORS, make_maze
+from .storage import CorpusWriter, corpus_dtype, pack_walls
+
+def derive_seed(seed, index):
+    """
+    Derive the seed of a maze of a corpus from the seed of the corpus and the index of the maze, so every maze
+    gets an independent, well mixed seed that does not depend on how the work was split between processes.
+
+    Parameters:
+    seed (int): The seed of the corpus.
+    index (int): The index of the maze in the corpus.
+
+    Returns:
+    seed (int): The 64-bit seed of the maze.
+    """
+    digest = hashlib.blake2b("{}:{}".format(seed, index).encode("ascii"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def generate_records(algorithm, width, height, seeds):
+    """
+    Generate mazes and pack them into corpus records, in a worker process.
+
+    Parameters:
+    algorithm (str): The name of the generation algorithm.
+    width (int): The number of cells horizontally in the mazes.
+    height (int): The number of cells vertically in the mazes.
+    seeds (list): The seed of each maze.
+
+    Returns:
+    records (np.ndarray): The records of the mazes (see `storage.corpus_dtype`).
+    """
+    records = np.zeros(len(seeds), dtype=corpus_dtype(width, height))
+    for record, seed in zip(records, seeds):
+        maze, start, end = make_maze(algorithm, width, height, seed)
+        record['seed'] = seed
+        record['start'] = (start.x, start.y)
+        record['end'] = (end.x, end.y)
+        record['walls'] = pack_walls(maze.walls)
+    return records
+
+
+def generate_corpus(filename, count, width, height, algorithm='dfs', seed=0, workers=None, chunk_size=1024):
+    """
+    Generate a corpus of mazes across a pool of worker processes and stream them to a corpus file (see
+    `storage.CorpusWriter`), in order. Maze i is generated from the seed `derive_seed(seed, i)`, recorded
+    with it, so the corpus is the same whatever the number of workers and any maze can be generated again
+    with `generators.make_maze(algorithm, width, height, seed)`.
+
+    The mazes are generated in chunks of `chunk_size`, and only a couple of chunks per worker are in flight
+    at any time, so the memory use does not grow with the size of the corpus.
+
+    Parameters:
+    filename (str): The path of the corpus file.
+    count (int): The number of mazes to generate.
+    width (int): The number of cells horizontally in the mazes.
+    height (int): The number of cells vertically in the mazes.
+    algorithm (str): The name of the generation algorithm (a key of generators.GENERATORS). Default is 'dfs'.
+    seed (int): The seed of the corpus. Default is 0.
+    workers (int): The number of worker processes. Default is None (one per CPU core).
+    chunk_size (int): The number of mazes generated by a worker at once. Default is 1024.
+
+    Returns:
+    count (int): The number of mazes written.
+    """
+    if algorithm not in GENERATORS:
+        raise ValueError("unknown maze generation algorithm {!r}, expected one of {}".format(
+            algorithm, ", ".join(sorted(GENERATORS))))
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, chunk_size)
+    starts = range(0, count, chunk_size)
+
+    with CorpusWriter(filename, width, height, algorithm) as writer, ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        next_chunk = 0
+        while pending or next_chunk < len(starts):
+            # Keep two chunks per worker in flight
+            while next_chunk < len(starts) and len(pending) < 2 * workers:
+                first = starts[next_chunk]
+                seeds = [derive_seed(seed, index) for index in range(first, min(first + chunk_size, count))]
+                pending.append(executor.submit(generate_records, algorithm, width, height, seeds))
+                next_chunk += 1
+            writer.write(pending.popleft().result())
+        return writer.count
+
+
+def main(argv=None):
+    """
+    Command line entry point: generate a corpus of mazes.
+    """
+    parser = argparse.ArgumentParser(description="Generate a corpus of reproducible mazes across worker processes.")
+    parser.add_argument("output", help="the corpus file to write")
+    parser.add_argument("-n", "--count", type=int, required=True, help="number of mazes")
+    parser.add_argument("--width", type=int, required=True, help="number of cells horizontally")
+    parser.add_argument("--height", type=int, required=True, help="number of cells vertically")
+    parser.add_argument("-a", "--algorithm", choices=sorted(GENERATORS), default="dfs", help="generation algorithm")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed of the corpus (default: 0)")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="number of worker processes (default: one per core)")
+    parser.add_argument("--chunk-size", type=int, default=1024, help="mazes generated by a worker at once (default: 1024)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    count = generate_corpus(args.output, args.count, args.width, args.height, args.algorithm, args.seed,
+                            args.workers, args.chunk_size)
+    elapsed = time.perf_counter() - started
+    print("{} mazes of {}x{} cells written to {} in {:.2f} s ({:.0f} mazes/s)".format(
+        count, args.width, args.height, args.output, elapsed, count / max(elapsed, 1e-9)), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
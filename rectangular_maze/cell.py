@@ -1,6 +1,5 @@
-import pygame
 import random
-from .settings import BLACK, WHITE, RED, GREEN, screen, WIDTH, HEIGHT, WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT
+from .settings import BLACK, WHITE, RED, GREEN
 
 class Cell:
     """
@@ -45,7 +44,7 @@ class Cell:
         self.f = self.g + self.h  # f = g + h
 
         
-    def draw(self, CELL_SIZE):
+    def draw(self, CELL_SIZE, screen=None):
         """
         Draw the cell on the screen based on its status. 
         The cell's status can be: current (green), backtracked (white), visited (red).
@@ -53,8 +52,14 @@ class Cell:
 
         Parameters:
         CELL_SIZE (int): The size of each cell on the screen in pixels.
+        screen (pygame.Surface): The surface to draw on. Default is the Pygame window from the settings.
         """
-        
+        import pygame
+
+        if screen is None:
+            from . import settings
+            screen = settings.screen
+
         # Determine the pixel position of the cell on the screen
         x, y = self.x * CELL_SIZE, self.y * CELL_SIZE
 
@@ -78,7 +83,7 @@ class Cell:
 
 
             
-    def check_neighbors(self, grid, WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT):
+    def check_neighbors(self, grid, WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT, rng=None):
         """ 
         Check the neighboring cells to see if they have been visited.
         If they have not, add them to the list of potential next cells to visit.
@@ -88,6 +93,7 @@ class Cell:
         grid (list): The grid representing the maze.
         WIDTH_CELL_COUNT (int): The total number of cells horizontally in the maze.
         HEIGHT_CELL_COUNT (int): The total number of cells vertically in the maze.
+        rng (random.Random): The random number generator to use. Default is None (the global `random` module).
 
         Returns:
         neighbor (Cell): A randomly chosen neighboring cell that hasn't been visited.
@@ -121,4 +127,4 @@ class Cell:
 
         # If there are unvisited neighbors, return one randomly
         if neighbors:
-            return random.choice(neighbors)
+            return (rng or random).choice(neighbors)
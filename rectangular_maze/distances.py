@@ -0,0 +1,128 @@
+import numpy as np
+from .maze import wall_mask, open_passages, TOP, RIGHT, BOTTOM, LEFT, UNSET
+from .solvers import PASSAGE_COUNTS
+
+# Frontiers with fewer cells are expanded by a plain loop, as each NumPy round has a fixed overhead
+VECTOR_FRONTIER = 64
+
+
+class DistanceMap:
+    """
+    The breadth-first distances from a start cell to every cell of a maze, and the statistics derived from them.
+
+    Attributes:
+        distances (np.ndarray): The (height, width) int32 number of steps from the start cell to each cell,
+                                UNSET (-1) for the cells that cannot be reached.
+        predecessors (np.ndarray): The (height, width) int32 id (y * width + x) of the cell each cell is reached
+                                   from on a shortest path, UNSET for the start cell and the cells not reached.
+        start (tuple): The (x, y) position of the start cell.
+        farthest (tuple): The (x, y) position of a reachable cell farthest from the start cell.
+        longest_path (int): The number of steps from the start cell to the farthest cell.
+        reachable (int): The number of cells that can be reached from the start cell.
+        dead_ends (int): The number of cells with a single open passage.
+        solution_length (int): The number of steps from the start cell to the end cell, None if there is no end
+                               cell or it cannot be reached.
+    """
+    def __init__(self, distances, predecessors, start, end, dead_ends):
+        self.distances = distances
+        self.predecessors = predecessors
+        self.start = start
+        height, width = distances.shape
+        farthest = int(np.argmax(distances))
+        self.farthest = (farthest % width, farthest // width)
+        self.longest_path = int(distances.flat[farthest])
+        self.reachable = int(np.count_nonzero(distances != UNSET))
+        self.dead_ends = dead_ends
+        self.solution_length = None
+        if end is not None and distances[end[1], end[0]] != UNSET:
+            self.solution_length = int(distances[end[1], end[0]])
+
+    def path_to(self, x, y):
+        """
+        Follow the predecessors from a cell back to the start cell.
+
+        Parameters:
+        x (int): The column of the cell.
+        y (int): The row of the cell.
+
+        Returns:
+        path (list): The (x, y) positions from the start cell to the cell, or None if it cannot be reached.
+        """
+        if self.distances[y, x] == UNSET:
+            return None
+        width = self.distances.shape[1]
+        predecessors = self.predecessors.ravel()
+        path = [y * width + x]
+        while predecessors[path[-1]] != UNSET:
+            path.append(int(predecessors[path[-1]]))
+        return [(cell % width, cell // width) for cell in reversed(path)]
+
+    def __repr__(self):
+        return "DistanceMap(from {}: {} cells reachable, longest path {} to {}, {} dead ends, solution {})".format(
+            self.start, self.reachable, self.longest_path, self.farthest, self.dead_ends, self.solution_length)
+
+
+def distance_map(grid, start, end=None):
+    """
+    Compute the distance and predecessor maps of a maze from a start cell in a single breadth-first pass, instead
+    of one search per cell. The search runs on the wall bitmask one frontier (all the cells at the same distance)
+    at a time: the frontier is expanded in each of the four directions with NumPy, and the cells not reached yet
+    become the next frontier. Small frontiers, e.g. along the long corridors of depth-first mazes, are expanded
+    by a plain loop on the same arrays.
+
+    Parameters:
+    grid (list or Maze): The 2D grid representing the maze.
+    start (Cell): The cell the distances are measured from.
+    end (Cell): The cell the solution length is measured to. Default is None.
+
+    Returns:
+    distances (DistanceMap): The distance and predecessor maps, with the longest path, farthest cell,
+                             number of dead ends and solution length.
+    """
+    walls = wall_mask(grid)
+    height, width = walls.shape
+    size = width * height
+    passages = open_passages(walls).ravel()
+    distances = np.full(size, UNSET, dtype=np.int32)
+    predecessors = np.full(size, UNSET, dtype=np.int32)
+
+    moves = ((TOP, -width), (RIGHT, 1), (BOTTOM, width), (LEFT, -1))
+    steps = [[step for bit, step in moves if bits & bit] for bits in range(16)]
+    # The loop works on memory views of the same arrays, which index much faster than NumPy scalars
+    passage_view, distance_view, predecessor_view = memoryview(passages), memoryview(distances), memoryview(predecessors)
+
+    first = start.y * width + start.x
+    distances[first] = 0
+    frontier = [first]
+    level = 0
+    while len(frontier):
+        level += 1
+        if len(frontier) >= VECTOR_FRONTIER:
+            frontier = np.asarray(frontier, dtype=np.int64)
+            reached = []
+            for bit, step in moves:
+                cells = frontier[(passages[frontier] & bit) != 0]
+                neighbors = cells + step
+                # Each direction maps the frontier to distinct cells, later directions skip those already reached
+                new = distances[neighbors] == UNSET
+                cells, neighbors = cells[new], neighbors[new]
+                distances[neighbors] = level
+                predecessors[neighbors] = cells
+                reached.append(neighbors)
+            frontier = np.concatenate(reached)
+            if len(frontier) < VECTOR_FRONTIER:
+                frontier = frontier.tolist()
+        else:
+            reached = []
+            for cell in frontier:
+                for step in steps[passage_view[cell]]:
+                    neighbor = cell + step
+                    if distance_view[neighbor] == UNSET:
+                        distance_view[neighbor] = level
+                        predecessor_view[neighbor] = cell
+                        reached.append(neighbor)
+            frontier = reached
+
+    dead_ends = int(np.count_nonzero(PASSAGE_COUNTS[passages] == 1))
+    return DistanceMap(distances.reshape(height, width), predecessors.reshape(height, width), (start.x, start.y),
+                       None if end is None else (end.x, end.y), dead_ends)
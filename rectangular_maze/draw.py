@@ -1,6 +1,11 @@
 from PIL import Image, ImageDraw
+import numpy as np
 import os
+from . import instrument
+from .maze import wall_mask, TOP, RIGHT, BOTTOM, LEFT
+from .png import PNGWriter
 
+@instrument.traced('draw_maze')
 def draw_maze(maze, start, end, path=None, filename="maze_example/maze.png", cell_size=8, wall_color=(0, 0, 0), path_color=(255, 255, 255), shortest_path_color=(255, 105, 97)):
     """
     Draw the maze and the shortest path (if specified) and save it as an image. The maze is drawn on a white background,
@@ -8,7 +13,7 @@ def draw_maze(maze, start, end, path=None, filename="maze_example/maze.png", cel
     are also marked with specific colors. The output image is saved in the current directory as "maze.png".
 
     Parameters:
-    maze (list): The grid representing the maze.
+    maze (list or Maze): The grid representing the maze.
     start (Cell): The starting cell of the path.
     end (Cell): The ending cell of the path.
     path (list): The list of cells representing the shortest path. If None, the shortest path is not drawn.
@@ -22,60 +27,7 @@ def draw_maze(maze, start, end, path=None, filename="maze_example/maze.png", cel
     None
     """
     
-    # Calculate the size of the image based on the maze dimensions and cell size
-    height = len(maze) * cell_size + 2 * cell_size  # Additional padding for top and bottom borders
-    width = len(maze[0]) * cell_size + 2 * cell_size  # Additional padding for left and right borders
-
-    # Create a new image with a white background
-    img = Image.new("RGB", (width, height), path_color)
-    draw = ImageDraw.Draw(img)
-
-    # Draw the maze by iterating over each cell
-    for row in range(len(maze)):
-        for col in range(len(maze[0])):
-            cell = maze[row][col]
-
-            # Calculate the position of the cell in the image
-            x1 = col * cell_size + cell_size  # Include padding for left border 
-            y1 = row * cell_size + cell_size  # Include padding for top border
-            x2 = x1 + cell_size
-            y2 = y1 + cell_size
-
-            # Draw walls for each cell as needed
-            if cell.walls['top']:
-                draw.line([(x1, y1), (x2, y1)], fill=wall_color)  # Top wall
-            if cell.walls['right']:
-                draw.line([(x2, y1), (x2, y2)], fill=wall_color)  # Right wall
-            if cell.walls['bottom']:
-                draw.line([(x1, y2), (x2, y2)], fill=wall_color)  # Bottom wall
-            if cell.walls['left']:
-                draw.line([(x1, y1), (x1, y2)], fill=wall_color)  # Left wall
-                
-        # Draw a circle at the start of the path
-        start_cell = start
-        start_x = start_cell.x * cell_size + cell_size + cell_size // 2
-        start_y = start_cell.y * cell_size + cell_size + cell_size // 2
-        draw.ellipse([(start_x-1.5, start_y-1.5), (start_x+1.5, start_y+1.5)], fill=(60, 179, 113))  # green circle
-
-        # Draw a square at the end of the path
-        end_cell = end
-        end_x = end_cell.x * cell_size + cell_size + cell_size // 2
-        end_y = end_cell.y * cell_size + cell_size + cell_size // 2
-        draw.rectangle([(end_x-1.5, end_y-1.5), (end_x+1.5, end_y+1.5)], fill=(100, 149, 237))  # blue square
-        
-    # Draw the shortest path solution if one was provided
-    if path:
-        for i in range(len(path) - 1):  # we subtract 1 to avoid Index Error in the loop
-            cell = path[i]
-            next_cell = path[i + 1]  # get the next cell in the path
-
-            # Calculate the center coordinates of the current cell and the next cell
-            x1 = cell.x * cell_size + cell_size + cell_size // 2  # add an additional cell_size for the cell's top-left corner position
-            y1 = cell.y * cell_size + cell_size + cell_size // 2
-            x2 = next_cell.x * cell_size + cell_size + cell_size // 2
-            y2 = next_cell.y * cell_size + cell_size + cell_size // 2
-
-            draw.line([(x1, y1), (x2, y2)], fill=shortest_path_color, width=1)  # draw a line between the two centers
+    img = render_maze(maze, start, end, path, cell_size, wall_color, path_color, shortest_path_color)
     
     # Create the directory if it does not exist
     if not os.path.exists('maze_example'):
@@ -83,3 +35,307 @@ def draw_maze(maze, start, end, path=None, filename="maze_example/maze.png", cel
         
     # Save the image in the maze_example directory
     img.save(filename)
+
+    trace = instrument.current()
+    if trace is not None:
+        trace.count('draw_maze', 'pixels', img.width * img.height)
+        trace.count('draw_maze', 'bytes_written', os.path.getsize(filename))
+
+
+def render_maze(maze, start, end, path=None, cell_size=8, wall_color=(0, 0, 0), path_color=(255, 255, 255), shortest_path_color=(255, 105, 97)):
+    """
+    Render the maze and the shortest path (if specified) as an image. See `draw_maze` for the parameters.
+
+    The image is built as a NumPy array: the wall segments are painted from the wall bitmask with slicing, one
+    pixel row (column) per horizontal (vertical) grid line, and the shortest path is painted as a polyline mask.
+    Only the start and end markers are drawn with PIL. The result is identical to drawing each wall with
+    ImageDraw.line.
+
+    Returns:
+    img (PIL.Image): The rendered maze.
+    """
+    walls = wall_mask(maze)
+    height = walls.shape[0] * cell_size + 2 * cell_size  # Additional padding for top and bottom borders
+    centers = path_centers(path, cell_size)
+    return render_band(walls, start, end, centers, 0, height, cell_size, wall_color, path_color, shortest_path_color)
+
+
+def export_maze(maze, start, end, path=None, filename="maze_example/maze.png", cell_size=8, band_height=1024, wall_color=(0, 0, 0), path_color=(255, 255, 255), shortest_path_color=(255, 105, 97)):
+    """
+    Render the maze and the shortest path (if specified) band by band and stream the bands to the output file, 
+    so mazes whose image does not fit in memory can be exported. The peak memory is bounded by the band size
+    (band_height rows of pixels), not by the image size. The image is the same as the one of `draw_maze`.
+
+    Parameters:
+    maze (list or Maze): The grid representing the maze.
+    start (Cell): The starting cell of the path.
+    end (Cell): The ending cell of the path.
+    path (list): The list of cells representing the shortest path. If None, the shortest path is not drawn.
+    filename (str): The name of the output file, a row-streamed PNG, or a memory-mapped .npy array of 
+                    (height, width, 3) pixels if it ends with ".npy".
+    cell_size (int): The size of each cell in the image in pixels. Default is 8.
+    band_height (int): The number of rows of pixels rendered at once. Default is 1024.
+    wall_color (tuple): The RGB color of the walls in the maze. Default is black.
+    path_color (tuple): The RGB color of the paths in the maze. Default is white.
+    shortest_path_color (tuple): The RGB color of the shortest path in the maze (if specified). Default is red.
+
+    Returns:
+    None
+    """
+    walls = wall_mask(maze)
+    height_cell_count, width_cell_count = walls.shape
+    centers = path_centers(path, cell_size)
+
+    def render(top, bottom):
+        return render_band(walls, start, end, centers, top, bottom, cell_size, wall_color, path_color, shortest_path_color)
+
+    write_bands(filename, width_cell_count, height_cell_count, cell_size, band_height, render)
+
+
+def export_rows(rows, width_cell_count, height_cell_count, start, end, filename="maze_example/maze.png", cell_size=8, band_height=1024, wall_color=(0, 0, 0), path_color=(255, 255, 255), shortest_path_color=(255, 105, 97)):
+    """
+    Render a maze streamed as rows of walls (e.g. by `generators.stream_maze`) band by band, like `export_maze`, 
+    pulling the rows as the bands need them. Only the rows of walls crossing the current band are kept, so 
+    mazes of any height are exported with constant memory. No shortest path is drawn.
+
+    Parameters:
+    rows (iterable): The wall bitmask of each row of the maze, from top to bottom (bytes or uint8 arrays).
+    width_cell_count (int): The number of cells horizontally in the maze.
+    height_cell_count (int): The number of cells vertically in the maze.
+    start (Cell), end (Cell), filename (str), cell_size (int), band_height (int), wall_color (tuple), 
+    path_color (tuple), shortest_path_color (tuple): See `export_maze`.
+
+    Returns:
+    None
+    """
+    window = RowWindow(rows, width_cell_count, height_cell_count)
+
+    def render(top, bottom):
+        # The rows of cells used by the band (see `render_band`)
+        window.advance(max(0, top // cell_size - 2), min(height_cell_count, bottom // cell_size + 1))
+        return render_band(window, start, end, None, top, bottom, cell_size, wall_color, path_color, shortest_path_color)
+
+    write_bands(filename, width_cell_count, height_cell_count, cell_size, band_height, render)
+
+
+def write_bands(filename, width_cell_count, height_cell_count, cell_size, band_height, render):
+    """
+    Write the image of a maze band by band to a row-streamed PNG, or a memory-mapped .npy array of 
+    (height, width, 3) pixels if the file name ends with ".npy".
+
+    Parameters:
+    filename (str): The name of the output file.
+    width_cell_count (int): The number of cells horizontally in the maze.
+    height_cell_count (int): The number of cells vertically in the maze.
+    cell_size (int): The size of each cell in the image in pixels.
+    band_height (int): The number of rows of pixels rendered at once.
+    render (callable): Called as `render(top, bottom)` to render the rows of pixels [top, bottom) as a PIL image.
+    """
+    height = height_cell_count * cell_size + 2 * cell_size
+    width = width_cell_count * cell_size + 2 * cell_size
+
+    # Create the directory if it does not exist
+    directory = os.path.dirname(filename)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory)
+
+    if filename.lower().endswith(".npy"):
+        output = np.lib.format.open_memmap(filename, mode="w+", dtype=np.uint8, shape=(height, width, 3))
+    else:
+        output = PNGWriter(filename, width, height)
+
+    for top in range(0, height, band_height):
+        bottom = min(top + band_height, height)
+        band = render(top, bottom)
+        if isinstance(output, PNGWriter):
+            output.write_rows(np.asarray(band))
+        else:
+            output[top:bottom] = np.asarray(band)
+
+    if isinstance(output, PNGWriter):
+        output.close()
+    else:
+        output.flush()
+        del output
+
+
+class RowWindow:
+    """
+    A window over the rows of a wall bitmask streamed from top to bottom, indexed with the row numbers of 
+    the whole bitmask, so `render_band` can use it in place of the whole bitmask.
+
+    Attributes:
+        shape (tuple): The (height, width) shape of the whole bitmask.
+        first (int): The row number of the first row of the window.
+        walls (np.ndarray): The (rows, width) uint8 wall bitmask of the rows of the window.
+    """
+    def __init__(self, rows, width, height):
+        """
+        Parameters:
+        rows (iterable): The wall bitmask of each row, from top to bottom (bytes or uint8 arrays).
+        width (int): The number of cells horizontally in the maze.
+        height (int): The number of cells vertically in the maze.
+        """
+        self.shape = (height, width)
+        self.first = 0
+        self.walls = np.zeros((0, width), dtype=np.uint8)
+        self._rows = iter(rows)
+
+    def advance(self, first, last):
+        """
+        Move the window to the rows [first, last): drop the rows before `first` and pull the rows up to `last`.
+        The window can only move down.
+        """
+        self.walls = self.walls[max(0, first - self.first):]
+        self.first = max(first, self.first)
+        missing = last - self.first - len(self.walls)
+        if missing > 0:
+            rows = [np.frombuffer(bytes(next(self._rows)), dtype=np.uint8) for _ in range(missing)]
+            self.walls = np.concatenate([self.walls, np.stack(rows)])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.walls[index.start - self.first:index.stop - self.first]
+        return self.walls[np.asarray(index) - self.first]
+
+
+def path_centers(path, cell_size):
+    """
+    Calculate the pixel coordinates of the center of each cell of the path.
+
+    Parameters:
+    path (list): The list of cells representing the shortest path, or None.
+    cell_size (int): The size of each cell in the image in pixels.
+
+    Returns:
+    centers (np.ndarray): The (len(path), 2) x and y coordinates, or None if there is no path to draw.
+    """
+    if not path or len(path) < 2:
+        return None
+    return np.array([(cell.x, cell.y) for cell in path], dtype=np.int64) * cell_size + cell_size + cell_size // 2
+
+
+def render_band(walls, start, end, centers, top, bottom, cell_size, wall_color, path_color, shortest_path_color):
+    """
+    Render the rows of pixels [top, bottom) of the maze image. Only the rows of the wall bitmask and the
+    path segments that cross the band are used, so the cost and memory are proportional to the band.
+
+    Parameters:
+    walls (np.ndarray): The (height, width) uint8 wall bitmask.
+    start (Cell): The starting cell of the path.
+    end (Cell): The ending cell of the path.
+    centers (np.ndarray): The pixel coordinates of the centers of the path cells (see `path_centers`), or None.
+    top (int): The first row of pixels of the band.
+    bottom (int): The row of pixels after the last row of the band.
+    cell_size (int), wall_color (tuple), path_color (tuple), shortest_path_color (tuple): See `draw_maze`.
+
+    Returns:
+    img (PIL.Image): The band of the rendered maze.
+    """
+    height_cell_count, width_cell_count = walls.shape
+    width = width_cell_count * cell_size + 2 * cell_size  # Additional padding for left and right borders
+
+    # Create a new band with a white background
+    pixels = np.empty((bottom - top, width, 3), dtype=np.uint8)
+    pixels[:] = path_color
+
+    # Horizontal grid line k (k = 0..height_cell_count) lies on pixel row (k + 1) * cell_size. A segment of it 
+    # is a wall if the cell below has a top wall or the cell above has a bottom wall
+    lines = np.arange(max(0, -(-top // cell_size) - 1), min(height_cell_count, (bottom - 1) // cell_size - 1) + 1)
+    if len(lines):
+        segments = np.zeros((len(lines), width_cell_count), dtype=bool)
+        below = lines < height_cell_count
+        segments[below] |= (walls[lines[below]] & TOP) != 0
+        above = lines >= 1
+        segments[above] |= (walls[lines[above] - 1] & BOTTOM) != 0
+        mask = np.zeros((len(lines), width), dtype=bool)
+        mask[:, cell_size:cell_size + width_cell_count * cell_size] = np.repeat(segments, cell_size, axis=1)
+        mask[:, 2 * cell_size::cell_size][:, :width_cell_count] |= segments  # The lines include their end pixel
+        rows = pixels[(lines + 1) * cell_size - top]
+        rows[mask] = wall_color
+        pixels[(lines + 1) * cell_size - top] = rows
+
+    # Vertical grid line k (k = 0..width_cell_count) lies on pixel column (k + 1) * cell_size. Along cell row r
+    # it covers the pixel rows (r + 1) * cell_size to (r + 2) * cell_size, end pixel included. A segment of it
+    # is a wall if the cell on its right has a left wall or the cell on its left has a right wall
+    first = max(0, top // cell_size - 2)
+    last = min(height_cell_count, bottom // cell_size)
+    if first < last:
+        segments = np.zeros((last - first, width_cell_count + 1), dtype=bool)
+        segments[:, :-1] |= (walls[first:last] & LEFT) != 0
+        segments[:, 1:] |= (walls[first:last] & RIGHT) != 0
+
+        ys = np.arange(top, bottom)
+        cell_rows = ys // cell_size - 1
+        mask = np.zeros((bottom - top, width_cell_count + 1), dtype=bool)
+        inside = (cell_rows >= first) & (cell_rows < last)
+        mask[inside] = segments[cell_rows[inside] - first]
+        ends = (ys % cell_size == 0) & (cell_rows - 1 >= first) & (cell_rows - 1 < last)
+        mask[ends] |= segments[cell_rows[ends] - 1 - first]
+        cols = pixels[:, cell_size:(width_cell_count + 1) * cell_size + 1:cell_size]
+        cols[mask] = wall_color
+
+    # Draw a circle at the start of the path and a square at the end of the path
+    draw_marker(pixels, top, start, cell_size, "ellipse", (60, 179, 113))  # green circle
+    draw_marker(pixels, top, end, cell_size, "rectangle", (100, 149, 237))  # blue square
+
+    # Draw the shortest path solution if one was provided
+    if centers is not None:
+        x1, y1 = centers[:-1, 0], centers[:-1, 1] - top
+        dx, dy = np.diff(centers[:, 0]), np.diff(centers[:, 1])
+
+        # Only keep the segments crossing the band
+        crossing = (np.maximum(y1, y1 + dy) >= 0) & (np.minimum(y1, y1 + dy) < bottom - top)
+        straight = crossing & ((dx == 0) | (dy == 0))
+        diagonal = crossing & (dx != 0) & (dy != 0)
+
+        # Paint the horizontal and vertical segments between consecutive centers, end pixels included
+        if straight.any():
+            x1s, y1s, dxs, dys = x1[straight, None], y1[straight, None], dx[straight, None], dy[straight, None]
+            steps = np.arange(np.abs(dxs + dys).max() + 1)
+            xs = (x1s + np.sign(dxs) * np.minimum(steps, np.abs(dxs))).ravel()
+            ys = (y1s + np.sign(dys) * np.minimum(steps, np.abs(dys))).ravel()
+            inside = (ys >= 0) & (ys < bottom - top)
+            pixels[ys[inside], xs[inside]] = shortest_path_color
+
+    img = Image.fromarray(pixels, "RGB")
+
+    # Draw any diagonal segment of the path with PIL
+    if centers is not None:
+        draw = ImageDraw.Draw(img)
+        for i in np.flatnonzero(diagonal):
+            draw.line([(x1[i], y1[i]), (x1[i] + dx[i], y1[i] + dy[i])], fill=shortest_path_color, width=1)
+
+    return img
+
+
+def draw_marker(pixels, top, cell, cell_size, shape, color):
+    """
+    Draw the start or end marker of a cell on a band of pixels. The marker is drawn with PIL on a small mask 
+    around the center of the cell, in the coordinates of the full image, so it is rasterized exactly as if it 
+    was drawn on the full image even when it is cut by the edge of the band.
+
+    Parameters:
+    pixels (np.ndarray): The (rows, width, 3) band of pixels, starting at row `top` of the image.
+    top (int): The first row of pixels of the band.
+    cell (Cell): The cell to mark.
+    cell_size (int): The size of each cell in the image in pixels.
+    shape (str): The shape of the marker, "ellipse" or "rectangle".
+    color (tuple): The RGB color of the marker.
+    """
+    # Calculate the center of the cell and the corner of the mask around it
+    center_x = cell.x * cell_size + cell_size + cell_size // 2
+    center_y = cell.y * cell_size + cell_size + cell_size // 2
+    left, upper = max(0, center_x - 4), max(0, center_y - 4)
+
+    mask = Image.new("L", (9, 9), 0)
+    x, y = center_x - left, center_y - upper
+    getattr(ImageDraw.Draw(mask), shape)([(x-1.5, y-1.5), (x+1.5, y+1.5)], fill=255)
+    mask = np.asarray(mask) != 0
+
+    # Paint the part of the mask that lies in the band
+    first, last = max(upper, top), min(upper + 9, top + len(pixels))
+    right = min(left + 9, pixels.shape[1])
+    if first < last:
+        region = pixels[first - top:last - top, left:right]
+        region[mask[first - upper:last - upper, :right - left]] = color
@@ -1,28 +1,77 @@
-import pygame
 import random
-import os
+from . import instrument
 from .cell import Cell
-from .settings import screen, clock, DELAY, WHITE, BLACK, FPS, WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT
 
-def generate_maze(WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT, CELL_SIZE):
+@instrument.traced('generate_maze')
+def generate_maze(WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT, CELL_SIZE, frames=None):
     """
-    Generate a maze using the Depth-First Search algorithm. The function also saves each frame of the maze 
-    generation process as an image. The entrance and exit are created after the entire maze has been generated.
+    Generate a maze using the Depth-First Search algorithm while showing a live visualization in a pygame window.
+    The function also captures each frame of the maze generation process. By default the frames are streamed 
+    into "maze_example/maze.gif" as they are captured, so they are never all held in memory or written to disk 
+    as separate images. The entrance and exit are created after the entire maze has been generated.
 
     Parameters:
     WIDTH_CELL_COUNT (int): The number of cells horizontally in the maze.
     HEIGHT_CELL_COUNT (int): The number of cells vertically in the maze.
     CELL_SIZE (int): The size of each cell.
+    frames (list or FrameWriter): The sink the frames are appended to, e.g. a FrameWriter with frame skipping 
+                                  for large mazes or a list to keep them in memory. Default is None.
 
     Returns:
     grid (2D list of Cell): The maze as a 2D list of cells.
-    frames (list of str): A list of file paths to the frames of the maze generation process.
+    frames (list or FrameWriter): The frames of the maze generation process.
     start (Cell): The starting point (entrance) of the maze.
     end (Cell): The ending point (exit) of the maze.
     """
+    from .visualize import PygameObserver
+    from .gif import FrameWriter
 
-    # Initialize an empty list to store file paths of each image frame during the maze generation
-    frames = [] 
+    # Stream the frames into the generation GIF unless another sink is provided
+    if frames is None:
+        frames = FrameWriter("maze_example/maze.gif")
+
+    # Attach the pygame visualization to the generator as an observer
+    observer = PygameObserver(CELL_SIZE, WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT, frames=frames)
+    grid, start, end = build_maze(WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT, observer=observer)
+    observer.close()  # Close the pygame window
+    if isinstance(frames, FrameWriter):
+        frames.close()
+
+    trace = instrument.current()
+    if trace is not None:
+        trace.count('generate_maze', 'cells', WIDTH_CELL_COUNT * HEIGHT_CELL_COUNT)
+        trace.count('generate_maze', 'frames', getattr(frames, 'frame_count', len(frames)))
+
+    return grid, observer.frames, start, end
+
+
+def build_maze(WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT, observer=None, rng=None):
+    """
+    Generate a maze using the Depth-First Search algorithm without any display, clock or frame output.
+    The entrance and exit are created after the entire maze has been generated.
+
+    An observer can be attached to follow the generation. It must provide a `step(grid, current_cell, next_cell)` 
+    method, called after every step of the search with the neighbour the current cell was connected to (None 
+    when backtracking), returning False stops the generation early. It must also provide a 
+    `finish(grid, start, end)` method, called once the entrance and exit have been created.
+
+    Passing a seeded `random.Random` as `rng` makes the maze reproducible: it is the same maze as 
+    `generators.make_maze('dfs', WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT, seed)` with the same seed.
+
+    Parameters:
+    WIDTH_CELL_COUNT (int): The number of cells horizontally in the maze.
+    HEIGHT_CELL_COUNT (int): The number of cells vertically in the maze.
+    observer (object): An optional observer notified of every generation step. Default is None.
+    rng (random.Random): The random number generator to use. Default is None (the global `random` module).
+
+    Returns:
+    grid (2D list of Cell): The maze as a 2D list of cells.
+    start (Cell): The starting point (entrance) of the maze.
+    end (Cell): The ending point (exit) of the maze.
+    """
+
+    if rng is None:
+        rng = random
 
     # Initialize a 2D grid with instances of the Cell class, which represents the maze
     grid = [[Cell(x, y) for x in range(WIDTH_CELL_COUNT)] for y in range(HEIGHT_CELL_COUNT)]
@@ -31,91 +80,74 @@ def generate_maze(WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT, CELL_SIZE):
     stack = []  
 
     # Randomly select a starting cell for the maze. The DFS algorithm starts from this cell
-    start_x = random.randint(0, HEIGHT_CELL_COUNT - 1)
-    start_y = random.randint(0, WIDTH_CELL_COUNT - 1)
+    start_x = rng.randint(0, HEIGHT_CELL_COUNT - 1)
+    start_y = rng.randint(0, WIDTH_CELL_COUNT - 1)
     current_cell = grid[start_x][start_y]
     current_cell.visited = True # Mark the starting cell as visited
     stack.append(current_cell)  # Add the starting cell to the stack
 
-    # Continue running as long as there are unvisited cells
-    running = True
-    while running:
-        clock.tick(FPS)  # Limit the frame rate to make the visualization smoother
-
-        # Handle the event of closing the window
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-
-        if stack:  # Check if there are still cells in the stack
-            # Continue visiting the current cell and check for unvisited neighbours
-            current_cell.current = False
-            current_cell = stack[-1]
-            current_cell.current = True
-            current_cell.visited = True
-
-            # Check for unvisited neighbours
-            next_cell = current_cell.check_neighbors(grid, WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT)
-
-            if next_cell:  # If there is an unvisited neighbour
-                stack.append(next_cell)  # Add the unvisited neighbour to the stack
-                remove_walls(current_cell, next_cell)  # Remove the wall between the current cell and its neighbour
-            else:
-                # No unvisited neighbours left, backtrack and remove the cell from the stack
-                current_cell.backtracked = True
-                stack.pop()
-
-            pygame.time.delay(DELAY)  # Add a delay to visualize the maze generation process
-
-        else: 
-            running = False  # Stop running if all cells have been visited
-            # Reset the state of the final cell
-            current_cell.current = False
-            current_cell.visited = False
+    # Continue running as long as there are cells in the stack
+    while stack:
+        # Continue visiting the current cell and check for unvisited neighbours
+        current_cell.current = False
+        current_cell = stack[-1]
+        current_cell.current = True
+        current_cell.visited = True
+
+        # Check for unvisited neighbours
+        next_cell = current_cell.check_neighbors(grid, WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT, rng)
+
+        if next_cell:  # If there is an unvisited neighbour
+            stack.append(next_cell)  # Add the unvisited neighbour to the stack
+            remove_walls(current_cell, next_cell)  # Remove the wall between the current cell and its neighbour
+        else:
+            # No unvisited neighbours left, backtrack and remove the cell from the stack
             current_cell.backtracked = True
+            stack.pop()
 
-        screen.fill(BLACK)  # Fill the screen with black color
+        # Let the observer follow the step, it can stop the generation early (e.g. when its window is closed)
+        if observer is not None and observer.step(grid, current_cell, next_cell) is False:
+            break
 
-        # Draw each cell on the screen
-        for row in grid:
-            for cell in row:
-                cell.draw(CELL_SIZE)
+    if not stack:
+        # Reset the state of the final cell once all cells have been visited
+        current_cell.current = False
+        current_cell.visited = False
+        current_cell.backtracked = True
 
-        # Create entrance and exit if the maze generation is completed
-        if not running:
-            start, end = create_entrance_exit(grid)
+    # Create entrance and exit once the maze generation is completed
+    start, end = create_entrance_exit(grid, rng=rng)
 
-        pygame.display.flip()  # Update the full display surface to the screen
+    if observer is not None:
+        observer.finish(grid, start, end)
 
-        # Save each frame of the maze generation process as an image
-        frame_path = os.path.join("gif_frames", "frame_{}.jpg".format(str(len(frames)).zfill(5)))
-        pygame.image.save(screen, frame_path)
-        frames.append(frame_path)
-
-    pygame.quit()  # Close the pygame window
-
-    return grid, frames, start, end
+    return grid, start, end
 
     
-def create_entrance_exit(grid, scenario=None):
+def create_entrance_exit(grid, scenario=None, rng=None, farthest_exit=False):
     """
     Create an entrance and an exit in the maze based on a given scenario. If no scenario is provided, one 
     is selected randomly. In scenario 1, the entrance is created at any cell along the top border, and the 
     exit at any cell along the bottom border. In scenario 2, the entrance is created at any cell along the 
-    left border, and the exit at any cell along the right border.
+    left border, and the exit at any cell along the right border. With `farthest_exit`, the exit is instead 
+    the cell of that border farthest from the entrance (see `distances.distance_map`), for the hardest maze.
 
     Parameters:
-    grid (2D list of Cell): The grid representing the maze.
+    grid (2D list of Cell or Maze): The grid representing the maze.
     scenario (int): The scenario number (1 or 2). If not provided, one is selected randomly.
+    rng (random.Random): The random number generator to use. Default is None (the global `random` module).
+    farthest_exit (bool): Whether to place the exit at the farthest cell of its border. Default is False.
 
     Returns:
     start (Cell): The starting point (entrance) of the maze.
     end (Cell): The ending point (exit) of the maze.
     """
+    if rng is None:
+        rng = random
     
     # If a scenario isn't provided, pick one randomly
     if scenario is None:
-        scenario = random.randint(1, 2)
+        scenario = rng.randint(1, 2)
 
     # Determine the length of the row and the column of the grid
     row_len = len(grid)
@@ -124,16 +156,20 @@ def create_entrance_exit(grid, scenario=None):
     # Create entrance and exit based on the selected scenario
     if scenario == 1:
         # Scenario 1: Any cell along the top border for entrance, any cell along the bottom border for exit
-        entrance = random.randint(0, col_len - 1)
-        exit = random.randint(0, col_len - 1)
+        entrance = rng.randint(0, col_len - 1)
+        exit = rng.randint(0, col_len - 1)
+        if farthest_exit:
+            exit = farthest_cell(grid, grid[0][entrance], [(x, row_len - 1) for x in range(col_len)])[0]
         start = grid[0][entrance]
         end = grid[row_len - 1][exit]
         start.walls['top'] = False
         end.walls['bottom'] = False
     else:
         # Scenario 2: Any cell along the left border for entrance, any cell along the right border for exit
-        entrance = random.randint(0, row_len - 1)
-        exit = random.randint(0, row_len - 1)
+        entrance = rng.randint(0, row_len - 1)
+        exit = rng.randint(0, row_len - 1)
+        if farthest_exit:
+            exit = farthest_cell(grid, grid[entrance][0], [(col_len - 1, y) for y in range(row_len)])[1]
         start = grid[entrance][0]
         end = grid[exit][col_len - 1]
         start.walls['left'] = False
@@ -142,6 +178,24 @@ def create_entrance_exit(grid, scenario=None):
     return start, end
 
 
+def farthest_cell(grid, start, candidates):
+    """
+    Find the cell farthest from a start cell among candidate cells, from a single distance map of the maze.
+
+    Parameters:
+    grid (2D list of Cell or Maze): The grid representing the maze.
+    start (Cell): The cell the distances are measured from.
+    candidates (list): The (x, y) positions of the candidate cells.
+
+    Returns:
+    position (tuple): The (x, y) position of the farthest candidate (the first one on a tie).
+    """
+    from .distances import distance_map
+
+    distances = distance_map(grid, start).distances
+    return max(candidates, key=lambda position: distances[position[1], position[0]])
+
+
 def remove_walls(current, next):
     """
     Remove the wall between two adjacent cells. The function determines the relative position of the next cell 
@@ -0,0 +1,421 @@
+import random
+import numpy as np
+from .maze import Maze, TOP, RIGHT, BOTTOM, LEFT, ALL_WALLS
+from .cell import Cell
+from .generate import create_entrance_exit
+
+def carve_dfs(width, height, rng):
+    """
+    Carve a perfect maze with the randomized Depth-First Search (recursive backtracker) of `build_maze`, directly
+    on a flat wall bitmask instead of Cell objects. The random numbers are drawn in the same order as `build_maze`,
+    so both give the same maze from the same seed.
+
+    Parameters:
+    width (int): The number of cells horizontally in the maze.
+    height (int): The number of cells vertically in the maze.
+    rng (random.Random): The random number generator.
+
+    Returns:
+    walls (bytearray): The width * height wall bitmask, row by row.
+    """
+    walls = bytearray([ALL_WALLS]) * (width * height)
+    visited = bytearray(width * height)
+
+    # Start from a random cell, the row is drawn first like in build_maze
+    y = rng.randint(0, height - 1)
+    x = rng.randint(0, width - 1)
+    current = y * width + x
+    visited[current] = 1
+    stack = [current]
+
+    while stack:
+        current = stack[-1]
+        y, x = divmod(current, width)
+
+        # Unvisited neighbours, in the order of Cell.check_neighbors: left, top, right, bottom
+        neighbors = []
+        if x > 0 and not visited[current - 1]:
+            neighbors.append(current - 1)
+        if y > 0 and not visited[current - width]:
+            neighbors.append(current - width)
+        if x < width - 1 and not visited[current + 1]:
+            neighbors.append(current + 1)
+        if y < height - 1 and not visited[current + width]:
+            neighbors.append(current + width)
+
+        if neighbors:
+            next = rng.choice(neighbors)
+            visited[next] = 1
+            open_wall(walls, current, next, width)
+            stack.append(next)
+        else:
+            stack.pop()  # Backtrack
+    return walls
+
+
+def open_wall(walls, a, b, width):
+    """
+    Remove the wall between two adjacent cells of a flat wall bitmask.
+
+    Parameters:
+    walls (bytearray or np.ndarray): The flat wall bitmask.
+    a (int), b (int): The ids (y * width + x) of the two cells.
+    width (int): The number of cells horizontally in the maze.
+    """
+    # The vertical neighbours are checked first, as they are also 1 apart in a maze 1 cell wide
+    if b == a + width:
+        walls[a] &= ~BOTTOM & ALL_WALLS
+        walls[b] &= ~TOP & ALL_WALLS
+    elif b == a - width:
+        walls[a] &= ~TOP & ALL_WALLS
+        walls[b] &= ~BOTTOM & ALL_WALLS
+    elif b == a + 1:
+        walls[a] &= ~RIGHT & ALL_WALLS
+        walls[b] &= ~LEFT & ALL_WALLS
+    else:
+        walls[a] &= ~LEFT & ALL_WALLS
+        walls[b] &= ~RIGHT & ALL_WALLS
+
+
+def carve_kruskal(width, height, rng):
+    """
+    Carve a perfect maze with randomized Kruskal's algorithm: the walls between neighbouring cells are removed
+    in a random order, unless the cells are already connected, which is tracked with a union-find structure.
+    The mazes have many short dead ends. See `carve_dfs` for the parameters.
+    """
+    size = width * height
+    walls = bytearray([ALL_WALLS]) * size
+    parents = list(range(size))
+
+    def find(cell):
+        # Root of the set of the cell, halving the path on the way
+        while parents[cell] != cell:
+            parents[cell] = parents[parents[cell]]
+            cell = parents[cell]
+        return cell
+
+    # Every wall between two cells, as the pair (cell, right or bottom neighbour)
+    edges = [(cell, cell + 1) for cell in range(size) if cell % width < width - 1]
+    edges += [(cell, cell + width) for cell in range(size - width)]
+    rng.shuffle(edges)
+
+    remaining = size - 1  # Number of walls left to remove
+    for a, b in edges:
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parents[root_a] = root_b
+            open_wall(walls, a, b, width)
+            remaining -= 1
+            if not remaining:
+                break
+    return walls
+
+
+def carve_prim(width, height, rng):
+    """
+    Carve a perfect maze with randomized Prim's algorithm: the maze grows from a random cell, by connecting a
+    random cell of its frontier (the cells next to the maze) to a random neighbour already in the maze.
+    The mazes have many short dead ends. See `carve_dfs` for the parameters.
+    """
+    size = width * height
+    walls = bytearray([ALL_WALLS]) * size
+    IN, FRONTIER = 1, 2
+    state = bytearray(size)
+    frontier = []
+
+    def neighbors(cell):
+        y, x = divmod(cell, width)
+        if x > 0:
+            yield cell - 1
+        if y > 0:
+            yield cell - width
+        if x < width - 1:
+            yield cell + 1
+        if y < height - 1:
+            yield cell + width
+
+    def add(cell):
+        # Add a cell to the maze and its neighbours outside of the maze to the frontier
+        state[cell] = IN
+        for neighbor in neighbors(cell):
+            if not state[neighbor]:
+                state[neighbor] = FRONTIER
+                frontier.append(neighbor)
+
+    add(rng.randrange(size))
+    while frontier:
+        # Take a random frontier cell out (swapping it with the last one) and connect it to the maze
+        index = rng.randrange(len(frontier))
+        frontier[index], frontier[-1] = frontier[-1], frontier[index]
+        cell = frontier.pop()
+        open_wall(walls, cell, rng.choice([n for n in neighbors(cell) if state[n] == IN]), width)
+        add(cell)
+    return walls
+
+
+def eller_rows(width, height, rng):
+    """
+    Carve a perfect maze row by row with Eller's algorithm. Only the current row is kept in memory: the set
+    (connected component) of each of its cells. Neighbouring cells of a row are randomly joined if they are in
+    different sets, then at least one cell of each set is randomly connected to the next row. The last row joins
+    all the sets that are left.
+
+    Parameters:
+    width (int): The number of cells horizontally in the maze.
+    height (int): The number of cells vertically in the maze.
+    rng (random.Random): The random number generator.
+
+    Yields:
+    walls (bytearray): The finished wall bitmask of each row, from top to bottom.
+    """
+    sets = list(range(width))  # The set of each cell of the current row
+    members = {x: [x] for x in range(width)}  # The cells of the current row in each set
+    next_set = width  # The next unused set number
+    up = [False] * width  # Whether each cell of the current row is connected to the row above
+    for y in range(height):
+        last = y == height - 1
+        walls = bytearray([ALL_WALLS]) * width
+        for x in range(width):
+            if up[x]:
+                walls[x] &= ~TOP & ALL_WALLS
+
+        # Join neighbouring cells of different sets, at random (always on the last row), merging the smaller set
+        for x in range(width - 1):
+            if sets[x] != sets[x + 1] and (last or rng.getrandbits(1)):
+                open_wall(walls, x, x + 1, width)
+                keep, merged = sets[x], sets[x + 1]
+                if len(members[keep]) < len(members[merged]):
+                    keep, merged = merged, keep
+                for cell in members[merged]:
+                    sets[cell] = keep
+                members[keep] += members.pop(merged)
+        if last:
+            yield walls
+            break
+
+        # Connect each set to the next row: every cell at random, and at least one cell per set
+        below = [None] * width
+        for s, cells in members.items():
+            connected = [x for x in cells if rng.getrandbits(1)] or [rng.choice(cells)]
+            for x in connected:
+                walls[x] &= ~BOTTOM & ALL_WALLS
+                below[x] = s
+        yield walls
+
+        # The cells of the next row that are not connected from above start in new sets
+        up = [s is not None for s in below]
+        members = {}
+        for x in range(width):
+            if below[x] is None:
+                below[x] = next_set
+                next_set += 1
+            members.setdefault(below[x], []).append(x)
+        sets = below
+
+
+def carve_eller(width, height, rng):
+    """
+    Carve a perfect maze with Eller's algorithm, see `eller_rows`. See `carve_dfs` for the parameters.
+    """
+    walls = bytearray()
+    for row in eller_rows(width, height, rng):
+        walls += row
+    return walls
+
+
+def carve_wilson(width, height, rng):
+    """
+    Carve a perfect maze with Wilson's algorithm: loop-erased random walks from every cell outside of the
+    maze, until they hit the maze, which is then extended with the walk. The mazes are uniformly sampled
+    among all the possible perfect mazes. See `carve_dfs` for the parameters.
+    """
+    size = width * height
+    walls = bytearray([ALL_WALLS]) * size
+    in_maze = bytearray(size)
+    in_maze[rng.randrange(size)] = 1
+    step = [0] * size  # The cell the walk went to from each cell, later steps overwrite (erase) the loops
+
+    for first in range(size):
+        if in_maze[first]:
+            continue
+        # Random walk until the maze is reached
+        cell = first
+        while not in_maze[cell]:
+            y, x = divmod(cell, width)
+            moves = []
+            if x > 0:
+                moves.append(cell - 1)
+            if y > 0:
+                moves.append(cell - width)
+            if x < width - 1:
+                moves.append(cell + 1)
+            if y < height - 1:
+                moves.append(cell + width)
+            step[cell] = rng.choice(moves)
+            cell = step[cell]
+        # Add the loop-erased walk to the maze
+        cell = first
+        while not in_maze[cell]:
+            in_maze[cell] = 1
+            open_wall(walls, cell, step[cell], width)
+            cell = step[cell]
+    return walls
+
+
+def carve_binary_tree(width, height, rng):
+    """
+    Carve a perfect maze with the binary tree algorithm: every cell is connected either to its top or to its
+    right neighbour, at random. The cells are independent, so the maze is carved in a few vectorized passes,
+    but it is strongly biased: the top row and the right column are long corridors. See `carve_dfs` for
+    the parameters.
+    """
+    generator = np.random.default_rng(rng.getrandbits(64))
+    walls = np.full((height, width), ALL_WALLS, dtype=np.uint8)
+    north = generator.integers(0, 2, size=(height, width), dtype=np.uint8).astype(bool)
+    north[0, :] = False  # The top row can only go right
+    north[1:, -1] = True  # The right column can only go up
+    east = ~north
+    east[0, -1] = False  # The top right cell is the root
+
+    walls[north] &= ~TOP & ALL_WALLS
+    walls[:-1][north[1:]] &= ~BOTTOM & ALL_WALLS
+    walls[east] &= ~RIGHT & ALL_WALLS
+    walls[:, 1:][east[:, :-1]] &= ~LEFT & ALL_WALLS
+    return bytearray(walls.tobytes())
+
+
+def carve_sidewinder(width, height, rng):
+    """
+    Carve a perfect maze with the sidewinder algorithm: each row is split into random runs of cells connected
+    to the right, and each run is connected up through one of its cells, at random. The top row is a single
+    corridor. See `carve_dfs` for the parameters.
+    """
+    walls = bytearray([ALL_WALLS]) * (width * height)
+    for y in range(height):
+        run_start = y * width
+        for x in range(width):
+            cell = y * width + x
+            at_right = x == width - 1
+            if y > 0 and (at_right or rng.getrandbits(1)):
+                # Close the run, and connect it up through a random cell
+                member = rng.randint(run_start, cell)
+                open_wall(walls, member, member - width, width)
+                run_start = cell + 1
+            elif not at_right:
+                open_wall(walls, cell, cell + 1, width)
+    return walls
+
+
+# The maze generation algorithms by name. Each one is called as `carve(width, height, rng)` and returns the
+# flat wall bitmask of a maze without entrance and exit
+GENERATORS = {
+    'dfs': carve_dfs,
+    'kruskal': carve_kruskal,
+    'prim': carve_prim,
+    'eller': carve_eller,
+    'wilson': carve_wilson,
+    'binary_tree': carve_binary_tree,
+    'sidewinder': carve_sidewinder,
+}
+
+
+def make_maze(algorithm, width, height, seed=None):
+    """
+    Generate a maze with one of the GENERATORS, then create its entrance and exit. The maze only depends on
+    (algorithm, width, height, seed), so any maze can be generated again, bit for bit, from these four values.
+
+    Parameters:
+    algorithm (str): The name of the generation algorithm (a key of GENERATORS).
+    width (int): The number of cells horizontally in the maze.
+    height (int): The number of cells vertically in the maze.
+    seed (int): The seed of the random number generator. Default is None (a random maze).
+
+    Returns:
+    maze (Maze): The maze.
+    start (MazeCell): The starting point (entrance) of the maze.
+    end (MazeCell): The ending point (exit) of the maze.
+    """
+    if algorithm not in GENERATORS:
+        raise ValueError("unknown maze generation algorithm {!r}, expected one of {}".format(
+            algorithm, ", ".join(sorted(GENERATORS))))
+    rng = random.Random(seed)
+    walls = GENERATORS[algorithm](width, height, rng)
+    maze = Maze(width, height, np.frombuffer(walls, dtype=np.uint8).reshape(height, width))
+    start, end = create_entrance_exit(maze, rng=rng)
+    return maze, start, end
+
+
+def stream_maze(width, height, seed=None):
+    """
+    Generate a maze row by row with Eller's algorithm (see `eller_rows`), without ever holding the whole maze:
+    the state is O(width), so the height of the maze is only bounded by the time it takes to generate it.
+
+    The entrance and exit are drawn first, on the borders used by `create_entrance_exit`, and opened in the rows
+    as they are streamed. The maze is reproducible from (width, height, seed), but it is not the same maze as
+    `make_maze('eller', width, height, seed)`, which draws its entrance and exit after the walls.
+
+    Parameters:
+    width (int): The number of cells horizontally in the maze.
+    height (int): The number of cells vertically in the maze.
+    seed (int): The seed of the random number generator. Default is None (a random maze).
+
+    Returns:
+    start (Cell): The starting point (entrance) of the maze.
+    end (Cell): The ending point (exit) of the maze.
+    rows (generator): The finished wall bitmask of each row (bytearray), from top to bottom.
+    """
+    rng = random.Random(seed)
+
+    # Scenario 1: entrance on the top border and exit on the bottom border, scenario 2: left and right borders
+    if rng.randint(1, 2) == 1:
+        start, end = Cell(rng.randint(0, width - 1), 0), Cell(rng.randint(0, width - 1), height - 1)
+        start_wall, end_wall = TOP, BOTTOM
+    else:
+        start, end = Cell(0, rng.randint(0, height - 1)), Cell(width - 1, rng.randint(0, height - 1))
+        start_wall, end_wall = LEFT, RIGHT
+
+    def rows():
+        for y, row in enumerate(eller_rows(width, height, rng)):
+            if y == start.y:
+                row[start.x] &= ~start_wall & ALL_WALLS
+            if y == end.y:
+                row[end.x] &= ~end_wall & ALL_WALLS
+            yield row
+
+    return start, end, rows()
+
+
+def export_stream(filename, width, height, seed=None, cell_size=8, packed=True, compress=False):
+    """
+    Generate a maze with `stream_maze` and write it as it is generated, with constant memory: to a maze file
+    (see `storage.MazeWriter`) if the file name ends with ".maze", or rendered to an image otherwise (see
+    `draw.export_rows`).
+
+    Parameters:
+    filename (str): The path of the maze file or image.
+    width (int): The number of cells horizontally in the maze.
+    height (int): The number of cells vertically in the maze.
+    seed (int): The seed of the random number generator. Default is None (a random maze).
+    cell_size (int): The size of each cell in the image in pixels. Default is 8.
+    packed (bool), compress (bool): How the walls of the maze file are stored, see `storage.save_maze`.
+
+    Returns:
+    start (Cell): The starting point (entrance) of the maze.
+    end (Cell): The ending point (exit) of the maze.
+    """
+    start, end, rows = stream_maze(width, height, seed)
+    if filename.lower().endswith(".maze"):
+        from .storage import MazeWriter
+        with MazeWriter(filename, width, height, start, end, seed, 'eller_stream', packed, compress) as writer:
+            # Write blocks of rows, as writing row by row is dominated by the per call overhead
+            block = max(1, (1 << 16) // max(width, 1))
+            buffer = bytearray()
+            for y, row in enumerate(rows, 1):
+                buffer += row
+                if y % block == 0 or y == height:
+                    writer.write_rows(np.frombuffer(buffer, dtype=np.uint8))
+                    buffer = bytearray()
+    else:
+        from .draw import export_rows
+        export_rows(rows, width, height, start, end, filename=filename, cell_size=cell_size)
+    return start, end
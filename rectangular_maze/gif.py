@@ -1,29 +1,172 @@
-from moviepy.editor import ImageSequenceClip
-import os, glob
-from .settings import FPS
+import os
+import numpy as np
+from PIL import Image, GifImagePlugin
+from . import instrument
+from .settings import FPS, BLACK, RED, WHITE, GREEN
 
-def maze_gif(frames):
+class FrameWriter:
     """
-    This function generates a GIF animation from a sequence of image frames. 
-    It then removes the frames from the filesystem after the GIF is created.
+    Stream frames (RGB arrays) straight into a GIF or MP4 file, so only the last frame is kept in memory.
+
+    GIF frames are written as deltas: only the rectangle that changed since the previous frame is encoded.
+    Any other extension is encoded as a video through ffmpeg (imageio-ffmpeg, installed with moviepy).
+    Frames can be skipped to make a time-lapse of long animations: with `every=n` only one frame in n is
+    written, the last frame is always written.
+
+    Attributes:
+        filename (str): The path of the output file.
+        fps (int): The frame rate of the animation.
+        every (int): Write one frame every `every` frames.
+        frame_count (int): The number of frames received.
+        written_count (int): The number of frames written to the file.
+    """
+    def __init__(self, filename, fps=FPS, every=1, colors=(BLACK, RED, WHITE, GREEN)):
+        """
+        Initialize the writer, the file is created when the first frame is received.
+
+        Parameters:
+        filename (str): The path of the output file (.gif, or .mp4 and other video formats).
+        fps (int): The frame rate of the animation. Default is FPS.
+        every (int): Write one frame every `every` frames. Default is 1 (every frame).
+        colors (tuple): The colors reproduced exactly in the GIF palette. Default is the maze colors.
+        """
+        self.filename = filename
+        self.fps = fps
+        self.every = max(1, int(every))
+        self.colors = colors
+        self.frame_count = 0
+        self.written_count = 0
+        self.closed = False
+        self._pending = None  # Last skipped frame, written on close
+        self._file = None
+        self._previous = None  # Previous GIF frame, as palette indices
+        self._video = None
+
+    def append(self, frame):
+        """
+        Add a frame to the animation.
+
+        Parameters:
+        frame (np.ndarray): The (height, width, 3) uint8 RGB frame.
+        """
+        if self.frame_count % self.every == 0:
+            self._write(frame)
+            self._pending = None
+        else:
+            self._pending = frame
+        self.frame_count += 1
+
+    def close(self):
+        """
+        Write the last frame if it was skipped and finalize the file. Calling it again has no effect.
+        """
+        if self.closed:
+            return
+        if self._pending is not None:
+            self._write(self._pending)
+            self._pending = None
+        if self._file is not None:
+            self._file.write(b";")  # GIF trailer
+            self._file.close()
+        if self._video is not None:
+            self._video.close()
+        self.closed = True
+
+        trace = instrument.current()
+        if trace is not None:
+            trace.count('frame_writer', 'frames', self.frame_count)
+            trace.count('frame_writer', 'frames_written', self.written_count)
+            if os.path.exists(self.filename):
+                trace.count('frame_writer', 'bytes_written', os.path.getsize(self.filename))
+
+    def __len__(self):
+        return self.written_count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, frame):
+        # Create the directory if it does not exist
+        directory = os.path.dirname(self.filename)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        if self.filename.lower().endswith(".gif"):
+            self._write_gif(np.ascontiguousarray(frame, dtype=np.uint8))
+        else:
+            self._write_video(np.ascontiguousarray(frame, dtype=np.uint8))
+        self.written_count += 1
+
+    def _write_gif(self, frame):
+        # Map the frame to a fixed palette: the maze colors first, so they are reproduced exactly,
+        # then a 6x6x6 color cube for anything else
+        if self._file is None:
+            levels = range(0, 256, 51)
+            palette = [c for color in self.colors for c in color]
+            palette += [c for r in levels for g in levels for b in levels for c in (r, g, b)]
+            palette += [0] * (768 - len(palette))
+            self._palette = Image.new("P", (1, 1))
+            self._palette.putpalette(palette[:768])
+        image = Image.fromarray(frame, "RGB").quantize(palette=self._palette, dither=Image.Dither.NONE)
+        indices = np.asarray(image)
+        duration = 1000 / self.fps
+
+        if self._file is None:
+            # Write the GIF header with the global palette, looping forever
+            self._file = open(self.filename, "wb")
+            header, _ = GifImagePlugin.getheader(image, info={"loop": 0, "optimize": False})
+            self._file.write(b"".join(header))
+            offset = (0, 0)
+        else:
+            # Only encode the rectangle that changed since the previous frame
+            changed = indices != self._previous
+            rows = np.flatnonzero(changed.any(axis=1))
+            cols = np.flatnonzero(changed.any(axis=0))
+            if len(rows):
+                top, bottom, left, right = rows[0], rows[-1] + 1, cols[0], cols[-1] + 1
+            else:
+                top, bottom, left, right = 0, 1, 0, 1  # Nothing changed, a single pixel keeps the timing
+            offset = (int(left), int(top))
+            image = image.crop((left, top, right, bottom))
+
+        self._file.write(b"".join(GifImagePlugin.getdata(image, offset, duration=duration, disposal=1)))
+        self._previous = indices
+
+    def _write_video(self, frame):
+        if self._video is None:
+            import imageio_ffmpeg
+
+            height, width = frame.shape[:2]
+            self._video = imageio_ffmpeg.write_frames(self.filename, (width, height), fps=self.fps)
+            self._video.send(None)  # Start the encoder
+        self._video.send(frame)
+
+
+def maze_gif(frames, filename="maze_example/maze.gif"):
+    """
+    This function generates a GIF animation from a sequence of frames, streaming them into the file one by one.
+    Frames given as image files are removed from the filesystem after the GIF is created.
 
     Parameters:
-    frames (list): List of paths to the image frames.
+    frames (list or FrameWriter): List of RGB arrays or paths to the image frames. A FrameWriter has already
+                                  streamed its frames, so it is only closed.
+    filename (str): The path of the GIF file. Default is "maze_example/maze.gif".
     """
-    
-    # Create the directory if it does not exist
-    if not os.path.exists('maze_example'):
-        os.makedirs('maze_example')
-    
-    # Create a GIF from the frames with a set frames-per-second rate.
-    clip = ImageSequenceClip(frames, fps=FPS)
-    
-    # Write the created GIF to a file named 'maze.gif'.
-    clip.write_gif("maze_example/maze.gif")
-
-    # After the GIF is created, remove all frame images from the 'gif_frames' directory.
-    frames = glob.glob('gif_frames/*')
-    
-    # Loop through each frame in the directory and remove it.
+    if isinstance(frames, FrameWriter):
+        frames.close()
+        return
+
+    # Stream the frames into the GIF with a set frames-per-second rate
+    with FrameWriter(filename) as writer:
+        for frame in frames:
+            if isinstance(frame, str):
+                frame = np.asarray(Image.open(frame).convert("RGB"))
+            writer.append(frame)
+
+    # After the GIF is created, remove the frame images.
     for frame in frames:
-        os.remove(frame)
+        if isinstance(frame, str):
+            os.remove(frame)
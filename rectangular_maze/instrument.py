@@ -0,0 +1,192 @@
+import contextlib
+import contextvars
+import functools
+import json
+import time
+
+# The trace of the current context, None while instrumentation is disabled
+_current = contextvars.ContextVar("maze_trace", default=None)
+
+# The stage returned while instrumentation is disabled, entering and leaving it does nothing
+_DISABLED = contextlib.nullcontext()
+
+
+class Trace:
+    """
+    The statistics collected while instrumentation is enabled (see `tracing`), grouped by stage. Each stage has
+    its number of 'calls', total and maximum time in 'seconds' and 'max_seconds', and the counters reported for
+    it: totals (e.g. 'nodes_expanded', 'bytes_written') and peaks (e.g. 'open_set_peak').
+
+    Attributes:
+        name (str): The name of the traced run, e.g. the request it serves.
+        stages (dict): The statistics of each stage, keyed by stage name.
+        started (float): The Unix time the trace started at.
+        elapsed (float): The wall-clock time of the traced run in seconds, once it is finished.
+        error (str): The exception the traced run failed with, None if it did not fail.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.stages = {}
+        self.started = time.time()
+        self.elapsed = None
+        self.error = None
+
+    def _stage(self, name):
+        # The statistics of a stage, created on first use
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0}
+        return stage
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """
+        Time a call of a stage.
+
+        Parameters:
+        name (str): The name of the stage.
+        """
+        stage = self._stage(name)
+        started = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            elapsed = time.perf_counter() - started
+            stage['calls'] += 1
+            stage['seconds'] += elapsed
+            stage['max_seconds'] = max(stage['max_seconds'], elapsed)
+
+    def count(self, stage, name, value=1):
+        """
+        Add to a counter of a stage.
+
+        Parameters:
+        stage (str): The name of the stage.
+        name (str): The name of the counter.
+        value (int): The amount added. Default is 1.
+        """
+        stage = self._stage(stage)
+        stage[name] = stage.get(name, 0) + value
+
+    def peak(self, stage, name, value):
+        """
+        Record a value of a counter of a stage that only keeps its maximum.
+
+        Parameters:
+        stage (str): The name of the stage.
+        name (str): The name of the counter.
+        value (int): The value observed.
+        """
+        stage = self._stage(stage)
+        stage[name] = max(stage.get(name, value), value)
+
+    def as_dict(self):
+        """
+        Export the trace as a dict of plain values.
+
+        Returns:
+        trace (dict): The 'name', 'started', 'elapsed', 'error' and 'stages' of the trace.
+        """
+        return {
+            'name': self.name,
+            'started': self.started,
+            'elapsed': self.elapsed,
+            'error': self.error,
+            'stages': {name: dict(stage) for name, stage in self.stages.items()},
+        }
+
+    def to_json(self):
+        """
+        Export the trace as a single line of JSON, to be appended to a JSON lines log.
+
+        Returns:
+        line (str): The trace as JSON, without a trailing newline.
+        """
+        return json.dumps(self.as_dict())
+
+
+def current():
+    """
+    Return the trace of the current context, or None while instrumentation is disabled. Functions reporting
+    several counters fetch it once, and skip all the bookkeeping if it is None.
+    """
+    return _current.get()
+
+
+def stage(name):
+    """
+    Time a call of a stage in the current trace, as a context manager. Nothing is timed while instrumentation is
+    disabled.
+
+    Parameters:
+    name (str): The name of the stage.
+    """
+    trace = _current.get()
+    return _DISABLED if trace is None else trace.stage(name)
+
+
+def count(stage, name, value=1):
+    """
+    Add to a counter of a stage in the current trace, if instrumentation is enabled. See `Trace.count`.
+    """
+    trace = _current.get()
+    if trace is not None:
+        trace.count(stage, name, value)
+
+
+def traced(name):
+    """
+    Decorator timing every call of a function as a stage of the current trace (see `stage`).
+
+    Parameters:
+    name (str): The name of the stage.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            trace = _current.get()
+            if trace is None:
+                return function(*args, **kwargs)
+            with trace.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def tracing(name=None, output=None):
+    """
+    Enable instrumentation while running a pipeline, e.g. one request, and collect its statistics in a Trace.
+    The trace only covers the current thread (or asyncio task), so concurrent requests get separate traces, and
+    traces can be nested. Once the run is finished, even if it failed, the trace can be appended to a JSON lines
+    log.
+
+    Example:
+        with tracing("maze.png", output="traces.jsonl") as trace:
+            solve_image("maze.png", render="solved.png")
+        print(trace.as_dict()['stages']['a_star']['nodes_expanded'])
+
+    Parameters:
+    name (str): The name of the traced run. Default is None.
+    output (str or file): The JSON lines file (path or open text file) the trace is appended to. Default is None.
+
+    Returns:
+    trace (Trace): The trace collecting the statistics of the run.
+    """
+    trace = Trace(name)
+    token = _current.set(trace)
+    started = time.perf_counter()
+    try:
+        yield trace
+    except BaseException as error:
+        trace.error = "{}: {}".format(type(error).__name__, error)
+        raise
+    finally:
+        trace.elapsed = time.perf_counter() - started
+        _current.reset(token)
+        if output is not None:
+            if isinstance(output, str):
+                with open(output, "a") as log:
+                    log.write(trace.to_json() + "\n")
+            else:
+                output.write(trace.to_json() + "\n")
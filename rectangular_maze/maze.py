@@ -0,0 +1,333 @@
+import numpy as np
+
+# Bits of the wall bitmask, one bit per wall of a cell
+TOP, RIGHT, BOTTOM, LEFT = 1, 2, 4, 8
+ALL_WALLS = TOP | RIGHT | BOTTOM | LEFT
+
+# Map the wall names used by the Cell classes to their bit
+WALL_BITS = {'top': TOP, 'right': RIGHT, 'bottom': BOTTOM, 'left': LEFT}
+
+# Sentinel stored in the solver state arrays for "no value" (infinite cost, no parent)
+UNSET = -1
+
+
+class SolverState:
+    """
+    The A* properties (g, h, parent) of every cell of a maze, stored in flat arrays indexed by cell id (y * width + x)
+    instead of on the cells themselves.
+
+    Attributes:
+        g (np.ndarray): Distance from the start cell, UNSET for infinity.
+        h (np.ndarray): Manhattan distance to the goal cell.
+        parent (np.ndarray): Cell id of the predecessor in the path found by A*, UNSET for none.
+    """
+    def __init__(self, size):
+        """
+        Allocate the solver state for a maze of `size` cells.
+
+        Parameters:
+        size (int): The number of cells in the maze.
+        """
+        self.g = np.full(size, UNSET, dtype=np.int32)
+        self.h = np.zeros(size, dtype=np.int32)
+        self.parent = np.full(size, UNSET, dtype=np.int32)
+
+    def reset(self):
+        """
+        Reset every cell to its initial state (infinite cost, no parent).
+        """
+        self.g.fill(UNSET)
+        self.h.fill(0)
+        self.parent.fill(UNSET)
+
+
+class Maze:
+    """
+    A rectangular maze stored as a NumPy wall bitmask, one uint8 per cell holding the TOP, RIGHT, BOTTOM and LEFT bits.
+
+    The maze can be used wherever a 2D grid of cells is expected: `maze[y][x]` returns a lightweight MazeCell view
+    with the same `x`, `y`, `walls`, `g`, `h`, `f`, `parent` and `status` attributes as a Cell, backed by the arrays
+    of the maze. This lets `draw_maze`, `a_star` and `find_start_end` accept a Maze unchanged.
+
+    Attributes:
+        width (int): The number of cells horizontally in the maze.
+        height (int): The number of cells vertically in the maze.
+        walls (np.ndarray): The (height, width) uint8 wall bitmask.
+        status (dict): The status of the cells that are not in the 'default' status, keyed by (x, y).
+    """
+    def __init__(self, width, height, walls=None):
+        """
+        Initialize a maze of the given size, with every wall present unless a wall bitmask is provided.
+
+        Parameters:
+        width (int): The number of cells horizontally in the maze.
+        height (int): The number of cells vertically in the maze.
+        walls (np.ndarray): An optional (height, width) uint8 wall bitmask. Default is None.
+        """
+        self.width = width
+        self.height = height
+        if walls is None:
+            walls = np.full((height, width), ALL_WALLS, dtype=np.uint8)
+        self.walls = walls
+        self.status = {}
+        self._solver_state = None
+
+    @classmethod
+    def from_grid(cls, grid):
+        """
+        Build a maze from a 2D grid of Cell objects.
+
+        Parameters:
+        grid (2D list of Cell): The grid representing the maze.
+
+        Returns:
+        maze (Maze): The maze with the same walls as the grid.
+        """
+        maze = cls(len(grid[0]), len(grid))
+        maze.walls[:] = [[cell_bits(cell) for cell in row] for row in grid]
+        return maze
+
+    def to_grid(self, cell_class):
+        """
+        Build a 2D grid of cell objects with the same walls as the maze.
+
+        Parameters:
+        cell_class (type): The Cell class to instantiate (rectangular_maze.cell.Cell or preprocess.cell.Cell).
+
+        Returns:
+        grid (2D list of Cell): The grid representing the maze.
+        """
+        grid = [[cell_class(x, y) for x in range(self.width)] for y in range(self.height)]
+        for row, bits_row in zip(grid, self.walls.tolist()):
+            for cell, bits in zip(row, bits_row):
+                for side, bit in WALL_BITS.items():
+                    cell.walls[side] = bool(bits & bit)
+        return grid
+
+    @property
+    def solver_state(self):
+        """
+        The solver state arrays of the maze, only allocated the first time they are needed.
+        """
+        if self._solver_state is None:
+            self._solver_state = SolverState(self.width * self.height)
+        return self._solver_state
+
+    def has_wall(self, x, y, side):
+        """
+        Check whether a wall of the cell at (x, y) exists.
+
+        Parameters:
+        x (int): The x-coordinate of the cell in the grid.
+        y (int): The y-coordinate of the cell in the grid.
+        side (str): The wall to check ('top', 'right', 'bottom' or 'left').
+
+        Returns:
+        exists (bool): True if the wall exists.
+        """
+        return bool(self.walls[y, x] & WALL_BITS[side])
+
+    def cell(self, x, y):
+        """
+        Return a view of the cell at (x, y).
+        """
+        return MazeCell(self, x, y)
+
+    def __len__(self):
+        return self.height
+
+    def __getitem__(self, y):
+        if not -self.height <= y < self.height:
+            raise IndexError("maze row index out of range")
+        return MazeRow(self, y % self.height)
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield MazeRow(self, y)
+
+
+class MazeRow:
+    """
+    A view of a single row of a Maze, indexable by the x-coordinate of the cells.
+    """
+    def __init__(self, maze, y):
+        self.maze = maze
+        self.y = y
+
+    def __len__(self):
+        return self.maze.width
+
+    def __getitem__(self, x):
+        if not -self.maze.width <= x < self.maze.width:
+            raise IndexError("maze column index out of range")
+        return MazeCell(self.maze, x % self.maze.width, self.y)
+
+    def __iter__(self):
+        for x in range(self.maze.width):
+            yield MazeCell(self.maze, x, self.y)
+
+
+class MazeWalls:
+    """
+    A dict-like view of the walls of a single cell of a Maze, e.g. `walls['top']`.
+    """
+    def __init__(self, maze, x, y):
+        self.maze = maze
+        self.x = x
+        self.y = y
+
+    def __getitem__(self, side):
+        return bool(self.maze.walls[self.y, self.x] & WALL_BITS[side])
+
+    def __setitem__(self, side, exists):
+        if exists:
+            self.maze.walls[self.y, self.x] |= WALL_BITS[side]
+        else:
+            self.maze.walls[self.y, self.x] &= ~WALL_BITS[side] & ALL_WALLS
+
+    def keys(self):
+        return WALL_BITS.keys()
+
+    def items(self):
+        return [(side, self[side]) for side in WALL_BITS]
+
+    def __iter__(self):
+        return iter(WALL_BITS)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class MazeCell:
+    """
+    A view of a single cell of a Maze, with the same attributes as a Cell. Two views of the same cell compare equal.
+
+    Attributes:
+        x (int): The x-coordinate of the cell in the grid.
+        y (int): The y-coordinate of the cell in the grid.
+        walls (MazeWalls): Indicates whether each of the four walls (top, right, bottom, left) exist.
+        status (str): The status of the cell ('open', 'closed', 'path', 'start', 'end').
+        parent (MazeCell): The predecessor of this cell in the path found by A*.
+        g (float): Distance from the start cell.
+        h (float): Manhattan distance to the goal cell.
+        f (float): Estimated cost of the path through this cell. f = g + h
+    """
+    __slots__ = ('maze', 'x', 'y', 'id')
+
+    def __init__(self, maze, x, y):
+        self.maze = maze
+        self.x = x
+        self.y = y
+        self.id = y * maze.width + x
+
+    @property
+    def walls(self):
+        return MazeWalls(self.maze, self.x, self.y)
+
+    @property
+    def status(self):
+        return self.maze.status.get((self.x, self.y), 'default')
+
+    @status.setter
+    def status(self, status):
+        if status == 'default':
+            self.maze.status.pop((self.x, self.y), None)
+        else:
+            self.maze.status[(self.x, self.y)] = status
+
+    @property
+    def g(self):
+        g = self.maze.solver_state.g[self.id]
+        return float('inf') if g == UNSET else int(g)
+
+    @g.setter
+    def g(self, g):
+        self.maze.solver_state.g[self.id] = UNSET if g == float('inf') else g
+
+    @property
+    def h(self):
+        return int(self.maze.solver_state.h[self.id])
+
+    @h.setter
+    def h(self, h):
+        self.maze.solver_state.h[self.id] = h
+
+    @property
+    def f(self):
+        return self.g + self.h
+
+    @property
+    def parent(self):
+        parent = int(self.maze.solver_state.parent[self.id])
+        if parent == UNSET:
+            return None
+        return MazeCell(self.maze, parent % self.maze.width, parent // self.maze.width)
+
+    @parent.setter
+    def parent(self, parent):
+        self.maze.solver_state.parent[self.id] = UNSET if parent is None else parent.y * self.maze.width + parent.x
+
+    # Function to calculate the Manhattan distance to the goal
+    def calculate_h(self, end):
+        self.h = abs(end.x - self.x) + abs(end.y - self.y)
+
+    def __eq__(self, other):
+        return isinstance(other, MazeCell) and other.maze is self.maze and other.id == self.id
+
+    def __hash__(self):
+        return hash((id(self.maze), self.id))
+
+    def __repr__(self):
+        return "MazeCell(x={}, y={})".format(self.x, self.y)
+
+
+def cell_bits(cell):
+    """
+    Compute the wall bitmask of a single cell object.
+
+    Parameters:
+    cell (Cell): The cell of the grid.
+
+    Returns:
+    bits (int): The TOP, RIGHT, BOTTOM and LEFT bits of the walls that exist.
+    """
+    walls = cell.walls
+    return ((TOP if walls['top'] else 0) | (RIGHT if walls['right'] else 0) |
+            (BOTTOM if walls['bottom'] else 0) | (LEFT if walls['left'] else 0))
+
+
+def wall_mask(grid):
+    """
+    Return the wall bitmask of a grid, whether it is a Maze or a 2D list of Cell objects.
+
+    Parameters:
+    grid (Maze or 2D list of Cell): The grid representing the maze.
+
+    Returns:
+    walls (np.ndarray): The (height, width) uint8 wall bitmask.
+    """
+    if isinstance(grid, Maze):
+        return grid.walls
+    return Maze.from_grid(grid).walls
+
+
+def open_passages(walls):
+    """
+    Compute the passages between neighbouring cells of a wall bitmask. A passage is open when neither of the two 
+    cells has a wall on that side, the openings of the outer border (entrance and exit) are left out.
+
+    Parameters:
+    walls (np.ndarray): The (height, width) uint8 wall bitmask.
+
+    Returns:
+    passages (np.ndarray): The (height, width) uint8 bitmask of the open passages of each cell, with the TOP, 
+                           RIGHT, BOTTOM and LEFT bits of the directions that can be taken.
+    """
+    passages = np.zeros(walls.shape, dtype=np.uint8)
+    right = ((walls[:, :-1] & RIGHT) == 0) & ((walls[:, 1:] & LEFT) == 0)
+    passages[:, :-1] |= right * np.uint8(RIGHT)
+    passages[:, 1:] |= right * np.uint8(LEFT)
+    down = ((walls[:-1] & BOTTOM) == 0) & ((walls[1:] & TOP) == 0)
+    passages[:-1] |= down * np.uint8(BOTTOM)
+    passages[1:] |= down * np.uint8(TOP)
+    return passages
@@ -0,0 +1,270 @@
+import io
+import struct
+import zlib
+import numpy as np
+from . import instrument
+
+# Signature at the start of every PNG file
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+class PNGWriter:
+    """
+    Write an 8-bit RGB PNG file row by row, compressing the rows as they come, so the whole image
+    never has to be held in memory.
+
+    Attributes:
+        filename (str): The path of the PNG file.
+        width (int): The width of the image in pixels.
+        height (int): The height of the image in pixels.
+        rows_written (int): The number of rows written so far.
+    """
+    def __init__(self, filename, width, height, compression=6):
+        """
+        Create the PNG file and write its header.
+
+        Parameters:
+        filename (str): The path of the PNG file.
+        width (int): The width of the image in pixels.
+        height (int): The height of the image in pixels.
+        compression (int): The zlib compression level (0-9). Default is 6.
+        """
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._compressor = zlib.compressobj(compression)
+        self._file = open(filename, "wb")
+        self._file.write(PNG_SIGNATURE)
+        # Header: width, height, bit depth 8, color type 2 (RGB), default compression, filter and no interlace
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def write_rows(self, rows):
+        """
+        Append rows of pixels to the image.
+
+        Parameters:
+        rows (np.ndarray): The (n, width, 3) uint8 RGB rows.
+        """
+        rows = np.ascontiguousarray(rows, dtype=np.uint8).reshape(len(rows), self.width * 3)
+        # Every row starts with its filter type, 0 (none)
+        data = np.zeros((len(rows), self.width * 3 + 1), dtype=np.uint8)
+        data[:, 1:] = rows
+        compressed = self._compressor.compress(data.tobytes())
+        if compressed:
+            self._write_chunk(b"IDAT", compressed)
+        self.rows_written += len(rows)
+
+    def close(self):
+        """
+        Flush the compressed data and finalize the file.
+        """
+        if self.rows_written != self.height:
+            raise ValueError("{} rows written, expected {}".format(self.rows_written, self.height))
+        self._write_chunk(b"IDAT", self._compressor.flush())
+        self._write_chunk(b"IEND", b"")
+        instrument.count('png', 'bytes_written', self._file.tell())
+        self._file.close()
+
+    def _write_chunk(self, chunk_type, data):
+        # Each chunk is its length, type, data and the CRC of the type and data
+        self._file.write(struct.pack(">I", len(data)) + chunk_type + data)
+        self._file.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xFFFFFFFF))
+
+
+class PNGReader:
+    """
+    Read a non-interlaced 8-bit PNG file row by row, decompressing the data as the rows are requested,
+    so the whole image never has to be held in memory.
+
+    Rows using the none, sub and up filters are reconstructed with NumPy. The average and paeth filters depend
+    on the previous pixel of the same row, so batches of rows using them are handed to PIL's native decoder
+    (see `unfilter_rows`).
+
+    Attributes:
+        filename (str): The path of the PNG file.
+        width (int): The width of the image in pixels.
+        height (int): The height of the image in pixels.
+        channels (int): The number of channels of each pixel (1, 2, 3 or 4), palette images are expanded to RGB.
+    """
+    def __init__(self, filename):
+        """
+        Open the PNG file and read its header.
+
+        Parameters:
+        filename (str): The path of the PNG file.
+        """
+        self.filename = filename
+        self._file = open(filename, "rb")
+        try:
+            if self._file.read(8) != PNG_SIGNATURE:
+                raise ValueError("not a PNG file")
+
+            chunk_type, data = self._read_chunk()
+            if chunk_type != b"IHDR":
+                raise ValueError("the PNG file does not start with a header")
+            self.width, self.height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", data)
+            if bit_depth != 8 or interlace != 0 or color_type not in (0, 2, 3, 4, 6):
+                raise ValueError("only non-interlaced 8-bit PNG files can be streamed")
+            self.channels = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[color_type]
+            self._palette = None
+            self._decompressor = zlib.decompressobj()
+            self._compressed = b""  # Compressed data not decompressed yet
+            self._buffer = bytearray()  # Decompressed data, consumed from self._position
+            self._position = 0
+            self._previous = np.zeros(self.width * self.channels, dtype=np.uint8)
+            self._pending = None  # First IDAT chunk, read while looking for the palette
+            self.rows_read = 0
+
+            # Read the chunks before the image data, the palette in particular
+            while True:
+                chunk_type, data = self._read_chunk()
+                if chunk_type == b"PLTE":
+                    self._palette = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+                elif chunk_type == b"IDAT":
+                    self._pending = data
+                    break
+                elif chunk_type == b"IEND":
+                    raise ValueError("the PNG file has no image data")
+            if color_type == 3:
+                self.channels = 3
+        except Exception:
+            # Do not leave the file open when the header cannot be read, e.g. for unsupported PNG files
+            self._file.close()
+            raise
+
+    def read_rows(self, count):
+        """
+        Read the next rows of the image.
+
+        Parameters:
+        count (int): The number of rows to read, fewer are returned at the end of the image.
+
+        Returns:
+        rows (np.ndarray): The (n, width, channels) uint8 rows, or (n, width) for single-channel images.
+        """
+        count = min(count, self.height - self.rows_read)
+        stride = self.width * (1 if self._palette is not None else self.channels)
+        bpp = 1 if self._palette is not None else self.channels
+        filtered = np.empty((count, stride + 1), dtype=np.uint8)
+        for i in range(count):
+            # Decompress until a full row (filter type byte and pixels) is available, a bounded amount at a time
+            while len(self._buffer) - self._position < stride + 1:
+                if not self._compressed:
+                    if self._pending is None:
+                        chunk_type, data = self._read_chunk()
+                        if chunk_type != b"IDAT":
+                            raise ValueError("the PNG image data is truncated")
+                    else:
+                        data, self._pending = self._pending, None
+                    self._compressed = data
+                del self._buffer[:self._position]
+                self._position = 0
+                self._buffer += self._decompressor.decompress(self._compressed, 1 << 20)
+                self._compressed = self._decompressor.unconsumed_tail
+            filtered[i] = np.frombuffer(self._buffer, dtype=np.uint8, count=stride + 1, offset=self._position)
+            self._position += stride + 1
+
+        if count and (filtered[:, 0] > 4).any():
+            raise ValueError("unknown PNG filter type {}".format(filtered[:, 0].max()))
+        if count and (filtered[:, 0] >= 3).any():
+            rows = unfilter_rows(filtered, self._previous, bpp)
+        else:
+            rows = np.empty((count, stride), dtype=np.uint8)
+            previous = self._previous
+            for i in range(count):
+                rows[i] = previous = unfilter(filtered[i, 0], filtered[i, 1:], previous, bpp)
+        if count:
+            self._previous = rows[-1]
+        self.rows_read += count
+
+        if self._palette is not None:
+            return self._palette[rows]
+        if self.channels == 1:
+            return rows
+        return rows.reshape(count, self.width, self.channels)
+
+    def close(self):
+        """
+        Close the PNG file.
+        """
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_chunk(self):
+        # Each chunk is its length, type, data and CRC
+        length, chunk_type = struct.unpack(">I4s", self._file.read(8))
+        data = self._file.read(length)
+        self._file.read(4)
+        return chunk_type, data
+
+
+def unfilter(filter_type, row, previous, bpp):
+    """
+    Reconstruct a filtered row of PNG image data.
+
+    Parameters:
+    filter_type (int): The PNG filter type of the row (0 none, 1 sub, 2 up, 3 average, 4 paeth).
+    row (np.ndarray): The filtered bytes of the row.
+    previous (np.ndarray): The reconstructed bytes of the previous row (zeros for the first row).
+    bpp (int): The number of bytes per pixel.
+
+    Returns:
+    row (np.ndarray): The reconstructed bytes of the row.
+    """
+    if filter_type == 0:
+        return row
+    if filter_type == 1:
+        # Each byte adds the reconstructed byte one pixel to the left: a running sum per channel
+        return (np.cumsum(row.reshape(-1, bpp), axis=0, dtype=np.uint64) % 256).astype(np.uint8).ravel()
+    if filter_type == 2:
+        return row + previous
+    if filter_type not in (3, 4):
+        raise ValueError("unknown PNG filter type {}".format(filter_type))
+
+    return unfilter_rows(np.concatenate(([filter_type], row)).astype(np.uint8)[None], previous, bpp)[0]
+
+
+# The PNG color type of each number of bytes per pixel, see `unfilter_rows`
+BPP_COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+
+
+def unfilter_rows(filtered, previous, bpp):
+    """
+    Reconstruct consecutive filtered rows of PNG image data with PIL's native decoder, for the average and paeth
+    filters, which depend on the previous pixel of the same row and cannot be vectorized. The reconstruction only
+    depends on the number of bytes per pixel, so the rows are stored uncompressed in a minimal PNG of the color
+    type with that many bytes per pixel (palette indices are decoded as grey levels), after the previous row
+    unfiltered, and decoded as a whole.
+
+    Parameters:
+    filtered (np.ndarray): The (n, stride + 1) uint8 rows, each starting with its PNG filter type.
+    previous (np.ndarray): The reconstructed bytes of the row before the first one (zeros for the first row).
+    bpp (int): The number of bytes per pixel (1 to 4).
+
+    Returns:
+    rows (np.ndarray): The (n, stride) uint8 reconstructed rows.
+    """
+    from PIL import Image
+
+    count, stride = filtered.shape[0], filtered.shape[1] - 1
+    data = np.empty((count + 1, stride + 1), dtype=np.uint8)
+    data[0, 0] = 0
+    data[0, 1:] = previous
+    data[1:] = filtered
+
+    def chunk(chunk_type, payload):
+        # Each chunk is its length, type, data and the CRC of the type and data
+        crc = zlib.crc32(chunk_type + payload) & 0xFFFFFFFF
+        return struct.pack(">I", len(payload)) + chunk_type + payload + struct.pack(">I", crc)
+
+    header = struct.pack(">IIBBBBB", stride // bpp, count + 1, 8, BPP_COLOR_TYPES[bpp], 0, 0, 0)
+    png = (PNG_SIGNATURE + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(data.tobytes(), 0)) +
+           chunk(b"IEND", b""))
+    with Image.open(io.BytesIO(png)) as image:
+        return np.array(image).reshape(count + 1, stride)[1:]
@@ -1,18 +1,6 @@
-import pygame
-from .widgets import width_widget, height_widget
-
 # Set cell size in pixels
 CELL_SIZE = 12
 
-# Define number of cells along the width from the width widget value
-WIDTH_CELL_COUNT = width_widget.value
-
-# Define number of cells along the height from the height widget value
-HEIGHT_CELL_COUNT = height_widget.value
-
-# Define the window size in pixels, based on the number of cells and the cell size
-WIDTH, HEIGHT = WIDTH_CELL_COUNT * CELL_SIZE, HEIGHT_CELL_COUNT * CELL_SIZE
-
 # Set frames per second for the Pygame screen refresh rate
 FPS = 60
 
@@ -25,11 +13,61 @@ RED = (255, 105, 97)  # Red color
 WHITE = (255, 255, 255)  # White color
 GREEN = (144, 238, 144)  # Green color
 
-# Initialize the Pygame library
-pygame.init()
+# The Pygame window and clock, only created once a visualization is requested
+_display = None
+
+
+def maze_size():
+    """
+    Read the maze dimensions from the width and height widgets. The widgets (and ipywidgets) are only
+    loaded when this function is called.
+
+    Returns:
+    WIDTH_CELL_COUNT (int), HEIGHT_CELL_COUNT (int): The number of cells horizontally and vertically.
+    """
+    from .widgets import width_widget, height_widget
+    return width_widget.value, height_widget.value
+
+
+def init_display(WIDTH, HEIGHT):
+    """
+    Initialize the Pygame library and create the Pygame window, or resize it if the size changed.
+
+    Parameters:
+    WIDTH (int): The width of the window in pixels.
+    HEIGHT (int): The height of the window in pixels.
+
+    Returns:
+    screen (pygame.Surface): The Pygame window.
+    clock (pygame.time.Clock): A Pygame clock for controlling the frame rate.
+    """
+    global _display
+    import pygame
+
+    if _display is None or not pygame.display.get_init() or _display[0].get_size() != (WIDTH, HEIGHT):
+        # Initialize the Pygame library
+        pygame.init()
+
+        # Create a Pygame window with the requested size, and a clock for controlling the frame rate
+        _display = (pygame.display.set_mode((WIDTH, HEIGHT)), pygame.time.Clock())
+    return _display
 
-# Create a Pygame window with the predefined size
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
 
-# Define a Pygame clock for controlling the frame rate
-clock = pygame.time.Clock()
+def __getattr__(name):
+    # The maze dimensions and the Pygame window used to be created when this module was imported. They are now
+    # resolved on first access, so importing the package has no side effects
+    if name in ('WIDTH_CELL_COUNT', 'HEIGHT_CELL_COUNT', 'WIDTH', 'HEIGHT'):
+        WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT = maze_size()
+        return {
+            'WIDTH_CELL_COUNT': WIDTH_CELL_COUNT,
+            'HEIGHT_CELL_COUNT': HEIGHT_CELL_COUNT,
+            'WIDTH': WIDTH_CELL_COUNT * CELL_SIZE,
+            'HEIGHT': HEIGHT_CELL_COUNT * CELL_SIZE,
+        }[name]
+    if name in ('screen', 'clock'):
+        import pygame
+        if _display is None or not pygame.display.get_init():
+            WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT = maze_size()
+            init_display(WIDTH_CELL_COUNT * CELL_SIZE, HEIGHT_CELL_COUNT * CELL_SIZE)
+        return _display[0] if name == 'screen' else _display[1]
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,347 @@
+import heapq
+import time
+from collections import deque
+import numpy as np
+from .a_star import a_star
+from .maze import Maze, wall_mask, open_passages, TOP, RIGHT, BOTTOM, LEFT, UNSET
+
+# The four directions, clockwise from the top, as (wall bit, opposite wall bit)
+DIRECTIONS = ((TOP, BOTTOM), (RIGHT, LEFT), (BOTTOM, TOP), (LEFT, RIGHT))
+
+# The number of open passages of each of the 16 passage bitmasks
+PASSAGE_COUNTS = np.array([bin(bits).count("1") for bits in range(16)], dtype=np.int32)
+
+
+class SolveResult:
+    """
+    The result of a maze solver, whichever algorithm it uses.
+
+    Attributes:
+        solver (str): The name of the solver (a key of SOLVERS).
+        path (list): The cells from the start cell to the end cell, or None if no path is found.
+        nodes_expanded (int): The number of cells the solver expanded (took out of its frontier, filled or walked).
+        elapsed (float): The wall-clock time of the solve in seconds.
+    """
+    def __init__(self, solver, path, nodes_expanded, elapsed):
+        self.solver = solver
+        self.path = path
+        self.nodes_expanded = nodes_expanded
+        self.elapsed = elapsed
+
+    @property
+    def length(self):
+        """
+        The number of cells of the path, or None if no path is found.
+        """
+        return None if self.path is None else len(self.path)
+
+    def __repr__(self):
+        return "SolveResult({}: path of {} cells, {} nodes expanded in {:.3f} s)".format(
+            self.solver, self.length, self.nodes_expanded, self.elapsed)
+
+
+def solve(grid, start, end, solver='bfs'):
+    """
+    Find a path from the start cell to the end cell of a maze with one of the SOLVERS.
+
+    Parameters:
+    grid (list or Maze): The 2D grid representing the maze.
+    start (Cell): The starting cell of the path.
+    end (Cell): The ending cell of the path.
+    solver (str): The name of the solver (a key of SOLVERS). Default is 'bfs'.
+
+    Returns:
+    result (SolveResult): The path, number of nodes expanded and time of the solve.
+    """
+    if solver not in SOLVERS:
+        raise ValueError("unknown maze solver {!r}, expected one of {}".format(solver, ", ".join(sorted(SOLVERS))))
+    started = time.perf_counter()
+    maze = grid if isinstance(grid, Maze) else Maze(len(grid[0]), len(grid), wall_mask(grid))
+    ids, nodes_expanded = SOLVERS[solver](maze, start.y * maze.width + start.x, end.y * maze.width + end.x)
+    path = None
+    if ids is not None:
+        path = [grid[cell // maze.width][cell % maze.width] for cell in ids]
+    return SolveResult(solver, path, nodes_expanded, time.perf_counter() - started)
+
+
+def passage_steps(maze):
+    """
+    Prepare the moves of a maze for the searches: the open passages of every cell, and the steps (differences
+    of cell ids) each passage bitmask allows, so the neighbours of a cell are `cell + step` for each step of
+    `steps[passages[cell]]`.
+
+    Parameters:
+    maze (Maze): The maze.
+
+    Returns:
+    passages (list): The passage bitmask of each cell id (see `maze.open_passages`).
+    steps (list): The list of steps of each of the 16 passage bitmasks.
+    """
+    width = maze.width
+    moves = ((TOP, -width), (RIGHT, 1), (BOTTOM, width), (LEFT, -1))
+    steps = [[step for bit, step in moves if bits & bit] for bits in range(16)]
+    return open_passages(maze.walls).ravel().tolist(), steps
+
+
+def trace_back(parents, cell):
+    # Follow the parents from a cell back to the root of the search, returns the cells from the root
+    path = []
+    while cell != UNSET:
+        path.append(cell)
+        cell = parents[cell]
+    return path[::-1]
+
+
+def solve_a_star(maze, start, end):
+    """
+    A* with the Manhattan distance heuristic (see `a_star.a_star`).
+    The solvers are called with the maze and the ids (y * width + x) of the start and end cells, and return
+    the ids of the cells of the path (None if there is none) and the number of nodes expanded.
+    """
+    events = []
+    path = a_star(maze, maze.cell(start % maze.width, start // maze.width),
+                  maze.cell(end % maze.width, end // maze.width), events=events)
+    expanded = sum(1 for event in events if event[0] == 'closed') + (path is not None)
+    return (None if path is None else [cell.id for cell in path]), expanded
+
+
+def solve_bfs(maze, start, end):
+    """
+    Breadth-first search, which finds a shortest path without any heuristic. See `solve_a_star`.
+    """
+    passages, steps = passage_steps(maze)
+    parents = [UNSET] * (maze.width * maze.height)
+    seen = bytearray(maze.width * maze.height)
+    seen[start] = 1
+    queue = deque([start])
+    expanded = 0
+    while queue:
+        cell = queue.popleft()
+        expanded += 1
+        if cell == end:
+            return trace_back(parents, cell), expanded
+        for step in steps[passages[cell]]:
+            neighbor = cell + step
+            if not seen[neighbor]:
+                seen[neighbor] = 1
+                parents[neighbor] = cell
+                queue.append(neighbor)
+    return None, expanded
+
+
+def solve_bidirectional_bfs(maze, start, end):
+    """
+    Bidirectional breadth-first search: two searches, from the start and from the end, expanding the smaller
+    frontier one level at a time until they meet. Each search goes about half as deep, so far fewer cells are
+    expanded than with a single search. See `solve_a_star`.
+    """
+    if start == end:
+        return [start], 1
+    size = maze.width * maze.height
+    passages, steps = passage_steps(maze)
+    distances = ([UNSET] * size, [UNSET] * size)
+    parents = ([UNSET] * size, [UNSET] * size)
+    distances[0][start] = distances[1][end] = 0
+    frontiers = ([start], [end])
+    expanded = 0
+    while frontiers[0] and frontiers[1]:
+        side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+        mine, other = distances[side], distances[1 - side]
+        next_frontier, meeting, best = [], None, None
+        for cell in frontiers[side]:
+            expanded += 1
+            for step in steps[passages[cell]]:
+                neighbor = cell + step
+                if mine[neighbor] == UNSET:
+                    mine[neighbor] = mine[cell] + 1
+                    parents[side][neighbor] = cell
+                    next_frontier.append(neighbor)
+                    # The searches meet: keep the shortest of the paths through the cells of this level
+                    if other[neighbor] != UNSET and (best is None or other[neighbor] < best):
+                        meeting, best = neighbor, other[neighbor]
+        if meeting is not None:
+            head = trace_back(parents[0], meeting)
+            tail = trace_back(parents[1], meeting)[::-1]
+            return head + tail[1:], expanded
+        frontiers = (next_frontier, frontiers[1]) if side == 0 else (frontiers[0], next_frontier)
+    return None, expanded
+
+
+def solve_bidirectional_a_star(maze, start, end):
+    """
+    Bidirectional A*: an A* search from the start towards the end and one from the end towards the start, the
+    one with the smaller open set expanding next. The best path through a cell reached by both searches is kept,
+    until the lowest f of one of the open sets cannot beat it, so the path is a shortest one. See `solve_a_star`.
+    """
+    if start == end:
+        return [start], 1
+    width, size = maze.width, maze.width * maze.height
+    passages, steps = passage_steps(maze)
+    goals = ((end % width, end // width), (start % width, start // width))
+    costs = ([UNSET] * size, [UNSET] * size)
+    parents = ([UNSET] * size, [UNSET] * size)
+    closed = (bytearray(size), bytearray(size))
+
+    def heuristic(cell, side):
+        x, y = goals[side]
+        return abs(cell % width - x) + abs(cell // width - y)
+
+    costs[0][start] = costs[1][end] = 0
+    heaps = ([(heuristic(start, 0), 0, start)], [(heuristic(end, 1), 0, end)])
+    best, meeting = None, None
+    expanded = 0
+    while heaps[0] and heaps[1]:
+        # Every path not found yet goes through a cell of both open sets, so costs at least their lowest f
+        if best is not None and max(heaps[0][0][0], heaps[1][0][0]) >= best:
+            break
+        side = 0 if len(heaps[0]) <= len(heaps[1]) else 1
+        _, cost, cell = heapq.heappop(heaps[side])
+        if closed[side][cell] or cost != costs[side][cell]:
+            continue  # Stale entry
+        closed[side][cell] = 1
+        expanded += 1
+        mine, other = costs[side], costs[1 - side]
+        for step in steps[passages[cell]]:
+            neighbor = cell + step
+            cost = mine[cell] + 1
+            if mine[neighbor] == UNSET or cost < mine[neighbor]:
+                mine[neighbor] = cost
+                parents[side][neighbor] = cell
+                heapq.heappush(heaps[side], (cost + heuristic(neighbor, side), cost, neighbor))
+            if other[neighbor] != UNSET and (best is None or mine[neighbor] + other[neighbor] < best):
+                best, meeting = mine[neighbor] + other[neighbor], neighbor
+
+    if meeting is None:
+        return None, expanded
+    head = trace_back(parents[0], meeting)
+    tail = trace_back(parents[1], meeting)[::-1]
+    return head + tail[1:], expanded
+
+
+def solve_dead_end_filling(maze, start, end):
+    """
+    Dead-end filling: the dead ends (cells with a single passage, other than the start and end cells) are filled,
+    which turns the cells leading to them into dead ends, until none is left. In a perfect maze only the path is
+    left; otherwise a breadth-first search finds a shortest path among the cells left, as filling never removes a
+    cell of a path. The filling runs on the wall bitmask with NumPy, one frontier of dead ends at a time, then
+    cell by cell along the long corridors once the frontiers get small. See `solve_a_star`.
+    """
+    width, size = maze.width, maze.width * maze.height
+    passages = open_passages(maze.walls).ravel()
+    degree = PASSAGE_COUNTS[passages]
+    filled = np.zeros(size, dtype=bool)
+    keep = np.zeros(size, dtype=bool)
+    keep[[start, end]] = True
+
+    frontier = np.flatnonzero((degree <= 1) & ~keep)
+    moves = ((TOP, -width), (RIGHT, 1), (BOTTOM, width), (LEFT, -1))
+    steps = [[step for bit, step in moves if bits & bit] for bits in range(16)]
+    # Fill whole frontiers with NumPy while they are large (many short dead ends), the long corridors left
+    # are filled one cell at a time, as each NumPy round has a fixed overhead
+    while len(frontier) >= 64:
+        filled[frontier] = True
+        # The passage left from each dead end leads to a cell with one passage less
+        reached = []
+        for bit, step in moves:
+            cells = frontier[(passages[frontier] & bit) != 0] + step
+            reached.append(cells[~filled[cells]])
+        reached = np.concatenate(reached)
+        np.subtract.at(degree, reached, 1)
+        reached = np.unique(reached)
+        frontier = reached[(degree[reached] <= 1) & ~keep[reached]]
+
+    passages, degree, keep = passages.tolist(), degree.tolist(), keep.tolist()
+    filled = bytearray(filled.view(np.uint8).tobytes())
+    stack = frontier.tolist()
+    while stack:
+        cell = stack.pop()
+        if filled[cell]:
+            continue
+        filled[cell] = 1
+        for step in steps[passages[cell]]:
+            neighbor = cell + step
+            if not filled[neighbor]:
+                degree[neighbor] -= 1
+                if degree[neighbor] <= 1 and not keep[neighbor]:
+                    stack.append(neighbor)
+
+    # Search the cells left
+    expanded = filled.count(1)
+    parents = [UNSET] * size
+    seen = filled
+    seen[start] = 1
+    queue = deque([start])
+    while queue:
+        cell = queue.popleft()
+        expanded += 1
+        if cell == end:
+            return trace_back(parents, cell), expanded
+        for step in steps[passages[cell]]:
+            neighbor = cell + step
+            if not seen[neighbor]:
+                seen[neighbor] = 1
+                parents[neighbor] = cell
+                queue.append(neighbor)
+    return None, expanded
+
+
+def solve_wall_follower(maze, start, end):
+    """
+    Wall follower (left-hand rule): walk through the maze always keeping a wall on the left, and erase the loops
+    of the walk. It needs no memory besides the walk, and always finds the path of a perfect maze, but it is not
+    the shortest path in mazes with loops, and it can miss the end cell if it is not on the same wall as the start 
+    cell (e.g. in the middle of a maze with loops). See `solve_a_star`.
+    """
+    width, size = maze.width, maze.width * maze.height
+    passages = open_passages(maze.walls).ravel().tolist()
+    steps = (-width, 1, width, -1)  # Clockwise from the top, like DIRECTIONS
+    path, positions = [start], {start: 0}
+    # Start with the left hand on the outer wall if the start cell is on the border (its entrance): facing up
+    # on the left border, right on the top border, down on the right border and left on the bottom border
+    x, y = start % width, start // width
+    if x == 0:
+        direction = 0
+    elif y == 0:
+        direction = 1
+    elif x == width - 1:
+        direction = 2
+    elif y == maze.height - 1:
+        direction = 3
+    else:
+        direction = 0
+    cell = start
+    expanded = 1
+    # A walk that keeps a hand on the wall visits every passage at most twice in each direction
+    for _ in range(4 * size + 4):
+        if cell == end:
+            return path, expanded
+        # Try to turn left, go straight, turn right, then go back
+        for turn in (3, 0, 1, 2):
+            heading = (direction + turn) % 4
+            if passages[cell] & DIRECTIONS[heading][0]:
+                break
+        else:
+            return None, expanded  # A cell without any passage
+        direction = heading
+        cell += steps[direction]
+        expanded += 1
+        if cell in positions:
+            # Back on the walk: erase the loop
+            for erased in path[positions[cell] + 1:]:
+                del positions[erased]
+            del path[positions[cell] + 1:]
+        else:
+            positions[cell] = len(path)
+            path.append(cell)
+    return None, expanded
+
+
+# The maze solvers by name, see `solve_a_star` for their interface
+SOLVERS = {
+    'a_star': solve_a_star,
+    'bfs': solve_bfs,
+    'bidirectional_bfs': solve_bidirectional_bfs,
+    'bidirectional_a_star': solve_bidirectional_a_star,
+    'dead_end_filling': solve_dead_end_filling,
+    'wall_follower': solve_wall_follower,
+}
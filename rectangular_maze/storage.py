@@ -0,0 +1,441 @@
+import struct
+import zlib
+import numpy as np
+from .maze import Maze, wall_mask
+
+# Maze files: a fixed 80 byte header (magic, version, flags, width, height, entrance, exit, seed, size of the wall
+# data, algorithm) followed by the wall data: the bitmask at one byte per cell, packed at 4 bits per cell (see
+# `pack_walls`), and/or compressed with zlib, as told by the flags
+MAZE_MAGIC = b"MAZEFILE"
+MAZE_VERSION = 1
+MAZE_HEADER = struct.Struct("<8sHHIIIIIIQQ16s12x")
+PACKED, COMPRESSED, HAS_SEED = 1, 2, 4
+
+# Corpus files: a fixed 64 byte header (magic, version, width, height, number of mazes, algorithm), followed by
+# fixed size records, so the records can be memory-mapped as a NumPy structured array
+CORPUS_MAGIC = b"MAZECORP"
+CORPUS_VERSION = 1
+CORPUS_HEADER = struct.Struct("<8sHHIIQ32s4x")
+
+
+def pack_walls(walls):
+    """
+    Pack a wall bitmask at 4 bits per cell, two cells per byte: the first cell of each pair in the low nibble.
+
+    Parameters:
+    walls (np.ndarray): The (height, width) uint8 wall bitmask.
+
+    Returns:
+    packed (np.ndarray): The ceil(width * height / 2) packed bytes.
+    """
+    flat = np.ascontiguousarray(walls, dtype=np.uint8).ravel()
+    if len(flat) % 2:
+        flat = np.append(flat, np.uint8(0))
+    return flat[0::2] | (flat[1::2] << 4)
+
+
+def unpack_walls(packed, width, height):
+    """
+    Unpack a wall bitmask packed by `pack_walls`.
+
+    Parameters:
+    packed (np.ndarray): The packed bytes.
+    width (int): The number of cells horizontally in the maze.
+    height (int): The number of cells vertically in the maze.
+
+    Returns:
+    walls (np.ndarray): The (height, width) uint8 wall bitmask.
+    """
+    packed = np.asarray(packed, dtype=np.uint8)
+    walls = np.empty(2 * len(packed), dtype=np.uint8)
+    walls[0::2] = packed & 0x0F
+    walls[1::2] = packed >> 4
+    return walls[:width * height].reshape(height, width)
+
+
+def save_maze(filename, maze, start, end, seed=None, algorithm="", packed=True, compress=False):
+    """
+    Save a maze to a maze file, with its entrance, exit and the seed it was generated from.
+
+    Unpacked, uncompressed files hold the wall bitmask as is, so `load_maze` memory-maps it without reading
+    or copying anything. Packed files are half the size, compressed ones are the smallest (a few bits per cell
+    for perfect mazes) but have to be decompressed when loaded.
+
+    Parameters:
+    filename (str): The path of the maze file.
+    maze (Maze or 2D list of Cell): The grid representing the maze.
+    start (Cell): The starting point (entrance) of the maze.
+    end (Cell): The ending point (exit) of the maze.
+    seed (int): The seed the maze was generated from, if known. Default is None.
+    algorithm (str): The name of the generation algorithm, if known. Default is "".
+    packed (bool): Whether to pack the walls at 4 bits per cell. Default is True.
+    compress (bool): Whether to compress the walls with zlib. Default is False.
+
+    Returns:
+    None
+    """
+    walls = wall_mask(maze)
+    height, width = walls.shape
+    with MazeWriter(filename, width, height, start, end, seed, algorithm, packed, compress) as writer:
+        # Write the walls a block of rows at a time, so memory-mapped mazes are never loaded as a whole
+        rows = max(1, (1 << 22) // max(width, 1))
+        for top in range(0, height, rows):
+            writer.write_rows(walls[top:top + rows])
+
+
+class MazeWriter:
+    """
+    Write a maze file (see `save_maze`) row by row, packing and compressing the rows as they come, so the whole
+    maze never has to be held in memory, e.g. for the rows streamed by `generators.stream_maze`.
+
+    Attributes:
+        filename (str): The path of the maze file.
+        width (int): The number of cells horizontally in the maze.
+        height (int): The number of cells vertically in the maze.
+        rows_written (int): The number of rows written so far.
+    """
+    def __init__(self, filename, width, height, start, end, seed=None, algorithm="", packed=True, compress=False):
+        """
+        Create the maze file. See `save_maze` for the parameters.
+        """
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        flags = (PACKED if packed else 0) | (COMPRESSED if compress else 0) | (HAS_SEED if seed is not None else 0)
+        self._header = [MAZE_MAGIC, MAZE_VERSION, flags, width, height, start.x, start.y, end.x, end.y, seed or 0, 0,
+                        algorithm.encode("ascii")]
+        self._packed = packed
+        self._compressor = zlib.compressobj(6) if compress else None
+        self._carry = np.zeros(0, dtype=np.uint8)  # The last cell of an odd number of cells, not packed yet
+        self._size = 0  # The size of the wall data written so far
+        self._file = open(filename, "wb")
+        self._file.write(b"\0" * MAZE_HEADER.size)  # Written once the size of the wall data is known
+
+    def write_rows(self, rows):
+        """
+        Append rows of walls to the maze.
+
+        Parameters:
+        rows (np.ndarray): The (n, width) uint8 wall bitmask of the rows.
+        """
+        rows = np.asarray(rows, dtype=np.uint8).reshape(-1, self.width)
+        self.rows_written += len(rows)
+        cells = rows.ravel()
+        if self._packed:
+            # Pack an even number of cells, carrying the last one over to the next rows if needed
+            cells = np.concatenate((self._carry, cells))
+            even = len(cells) - len(cells) % 2
+            if self.rows_written < self.height:
+                cells, self._carry = cells[:even], cells[even:]
+            cells = pack_walls(cells)
+        self._write(cells.tobytes())
+
+    def close(self):
+        """
+        Flush the compressed data, write the header and close the file.
+        """
+        if self.rows_written != self.height:
+            raise ValueError("{} rows written, expected {}".format(self.rows_written, self.height))
+        if self._compressor is not None:
+            data = self._compressor.flush()
+            self._file.write(data)
+            self._size += len(data)
+        self._header[10] = self._size
+        self._file.seek(0)
+        self._file.write(MAZE_HEADER.pack(*self._header))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()  # Leave the error as it is, the file is incomplete anyway
+
+    def _write(self, data):
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        self._file.write(data)
+        self._size += len(data)
+
+
+def read_maze_header(filename):
+    """
+    Read the header of a maze file, without reading the walls.
+
+    Parameters:
+    filename (str): The path of the maze file.
+
+    Returns:
+    header (dict): The 'version', 'width', 'height', 'start' and 'end' (x, y) cells, 'seed' (None if unknown),
+                   'algorithm' and 'size' of the wall data in bytes, and whether the walls are 'packed' and
+                   'compressed'.
+    """
+    with open(filename, "rb") as file:
+        header = file.read(MAZE_HEADER.size)
+    if len(header) < MAZE_HEADER.size or header[:8] != MAZE_MAGIC:
+        raise ValueError("not a maze file")
+    _, version, flags, width, height, start_x, start_y, end_x, end_y, seed, size, algorithm = MAZE_HEADER.unpack(header)
+    if version > MAZE_VERSION:
+        raise ValueError("unsupported maze file version {}".format(version))
+    return {
+        'version': version,
+        'width': width,
+        'height': height,
+        'start': (start_x, start_y),
+        'end': (end_x, end_y),
+        'seed': seed if flags & HAS_SEED else None,
+        'algorithm': algorithm.rstrip(b"\0").decode("ascii"),
+        'size': size,
+        'packed': bool(flags & PACKED),
+        'compressed': bool(flags & COMPRESSED),
+    }
+
+
+def load_maze(filename, mode="r"):
+    """
+    Load a maze file saved by `save_maze`. The walls of unpacked, uncompressed files are memory-mapped, so
+    loading is instant whatever the size of the maze and the pages are only read when they are accessed.
+
+    Parameters:
+    filename (str): The path of the maze file.
+    mode (str): The np.memmap mode of memory-mapped walls: 'r' (read-only), 'c' (copy-on-write) or 'r+'
+                (changes are written to the file). Default is 'r'.
+
+    Returns:
+    maze (Maze): The maze.
+    start (MazeCell): The starting point (entrance) of the maze.
+    end (MazeCell): The ending point (exit) of the maze.
+    seed (int): The seed the maze was generated from, or None if unknown.
+    """
+    header = read_maze_header(filename)
+    width, height = header['width'], header['height']
+    if header['compressed']:
+        with open(filename, "rb") as file:
+            file.seek(MAZE_HEADER.size)
+            data = np.frombuffer(zlib.decompress(file.read(header['size'])), dtype=np.uint8)
+    else:
+        data = np.memmap(filename, dtype=np.uint8, mode=mode, offset=MAZE_HEADER.size, shape=(header['size'],))
+
+    if header['packed']:
+        walls = unpack_walls(data, width, height)
+    elif header['compressed']:
+        walls = data.reshape(height, width).copy()  # Writable
+    else:
+        walls = data.reshape(height, width)
+    maze = Maze(width, height, walls)
+    return maze, maze.cell(*header['start']), maze.cell(*header['end']), header['seed']
+
+
+def load_grid(filename, cell_class=None):
+    """
+    Load a maze file as a 2D grid of Cell objects, like the ones of `build_maze`.
+
+    Parameters:
+    filename (str): The path of the maze file.
+    cell_class (type): The Cell class to instantiate. Default is None (rectangular_maze.cell.Cell).
+
+    Returns:
+    grid (2D list of Cell): The maze as a 2D list of cells.
+    start (Cell): The starting point (entrance) of the maze.
+    end (Cell): The ending point (exit) of the maze.
+    """
+    if cell_class is None:
+        from .cell import Cell as cell_class
+    maze, start, end, _ = load_maze(filename)
+    grid = maze.to_grid(cell_class)
+    return grid, grid[start.y][start.x], grid[end.y][end.x]
+
+
+def convert(source, destination, cell_size=8, packed=True, compress=False):
+    """
+    Convert a maze between a maze file (.maze) and an image: maze files are rendered with `draw.export_maze`,
+    images are read with the `preprocess` pipeline (see `preprocess.pipeline.solve_image`). A maze file can also
+    be converted to another maze file, to pack or compress it.
+
+    Parameters:
+    source (str): The path of the maze file or image to convert.
+    destination (str): The path of the converted maze file or image (.png, or .npy for a memory-mapped array).
+    cell_size (int): The size of each cell in the rendered image in pixels. Default is 8.
+    packed (bool): Whether to pack the walls of the maze file (see `save_maze`). Default is True.
+    compress (bool): Whether to compress the walls of the maze file (see `save_maze`). Default is False.
+
+    Returns:
+    None
+    """
+    if source.lower().endswith(".maze"):
+        maze, start, end, seed = load_maze(source)
+        if destination.lower().endswith(".maze"):
+            algorithm = read_maze_header(source)['algorithm']
+            save_maze(destination, maze, start, end, seed, algorithm, packed, compress)
+        else:
+            from .draw import export_maze
+            export_maze(maze, start, end, filename=destination, cell_size=cell_size)
+    elif destination.lower().endswith(".maze"):
+        from preprocess.pipeline import solve_image
+        result = solve_image(source, solve=False)
+        save_maze(destination, result['grid'], result['start'], result['end'], packed=packed, compress=compress)
+    else:
+        raise ValueError("either the source or the destination must be a .maze file")
+
+
+def corpus_dtype(width, height):
+    """
+    The NumPy dtype of the records of a corpus of mazes of the given size.
+
+    Parameters:
+    width (int): The number of cells horizontally in the mazes.
+    height (int): The number of cells vertically in the mazes.
+
+    Returns:
+    dtype (np.dtype): The record of a maze: its 'seed', the (x, y) cells of its 'start' and 'end', and
+                      its packed 'walls' (see `pack_walls`).
+    """
+    return np.dtype([
+        ('seed', '<u8'),
+        ('start', '<u4', (2,)),
+        ('end', '<u4', (2,)),
+        ('walls', 'u1', ((width * height + 1) // 2,)),
+    ])
+
+
+class CorpusWriter:
+    """
+    Write a corpus of mazes of the same size to a file, appending the records as they come, so the
+    whole corpus never has to be held in memory.
+
+    Attributes:
+        filename (str): The path of the corpus file.
+        width (int): The number of cells horizontally in the mazes.
+        height (int): The number of cells vertically in the mazes.
+        algorithm (str): The name of the generation algorithm of the mazes.
+        count (int): The number of mazes written so far.
+    """
+    def __init__(self, filename, width, height, algorithm):
+        """
+        Create the corpus file and write its header.
+
+        Parameters:
+        filename (str): The path of the corpus file.
+        width (int): The number of cells horizontally in the mazes.
+        height (int): The number of cells vertically in the mazes.
+        algorithm (str): The name of the generation algorithm of the mazes.
+        """
+        self.filename = filename
+        self.width = width
+        self.height = height
+        self.algorithm = algorithm
+        self.count = 0
+        self.dtype = corpus_dtype(width, height)
+        self._file = open(filename, "wb")
+        self._write_header()
+
+    def write(self, records):
+        """
+        Append records to the corpus.
+
+        Parameters:
+        records (np.ndarray): The records, with the dtype of `corpus_dtype`.
+        """
+        records = np.asarray(records, dtype=self.dtype)
+        self._file.write(records.tobytes())
+        self.count += len(records)
+
+    def close(self):
+        """
+        Write the final number of mazes in the header and close the file.
+        """
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write_header(self):
+        self._file.write(CORPUS_HEADER.pack(CORPUS_MAGIC, CORPUS_VERSION, 0, self.width, self.height,
+                                            self.count, self.algorithm.encode("ascii")))
+
+
+class Corpus:
+    """
+    A corpus of mazes written by CorpusWriter. The records are memory-mapped, so opening a corpus is instant
+    whatever its size and only the mazes that are accessed are read.
+
+    Every maze can also be generated again from `(algorithm, width, height, seed)` with `generators.make_maze`.
+
+    Attributes:
+        filename (str): The path of the corpus file.
+        width (int): The number of cells horizontally in the mazes.
+        height (int): The number of cells vertically in the mazes.
+        algorithm (str): The name of the generation algorithm of the mazes.
+        records (np.memmap): The records of the mazes (see `corpus_dtype`).
+    """
+    def __init__(self, filename):
+        """
+        Open a corpus file.
+
+        Parameters:
+        filename (str): The path of the corpus file.
+        """
+        self.filename = filename
+        with open(filename, "rb") as file:
+            header = file.read(CORPUS_HEADER.size)
+        if len(header) < CORPUS_HEADER.size or header[:8] != CORPUS_MAGIC:
+            raise ValueError("not a maze corpus file")
+        _, version, _, self.width, self.height, count, algorithm = CORPUS_HEADER.unpack(header)
+        if version > CORPUS_VERSION:
+            raise ValueError("unsupported maze corpus version {}".format(version))
+        self.algorithm = algorithm.rstrip(b"\0").decode("ascii")
+        self.records = np.memmap(filename, dtype=corpus_dtype(self.width, self.height), mode="r",
+                                 offset=CORPUS_HEADER.size, shape=(count,))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, index):
+        """
+        Load a maze of the corpus.
+
+        Returns:
+        maze (Maze): The maze.
+        start (MazeCell): The starting point (entrance) of the maze.
+        end (MazeCell): The ending point (exit) of the maze.
+        seed (int): The seed the maze was generated from.
+        """
+        record = self.records[index]
+        maze = Maze(self.width, self.height, unpack_walls(record['walls'], self.width, self.height).copy())
+        start, end = maze.cell(*record['start'].tolist()), maze.cell(*record['end'].tolist())
+        return maze, start, end, int(record['seed'])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def main(argv=None):
+    """
+    Command line entry point: convert a maze between a maze file and an image (see `convert`).
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert a maze between a .maze file and an image.")
+    parser.add_argument("source", help="the maze file or image to convert")
+    parser.add_argument("destination", help="the converted maze file or image")
+    parser.add_argument("--cell-size", type=int, default=8, help="size of the rendered cells in pixels (default: 8)")
+    parser.add_argument("--unpacked", action="store_true", help="store one byte per cell, to memory-map the walls")
+    parser.add_argument("--compress", action="store_true", help="compress the walls with zlib")
+    args = parser.parse_args(argv)
+    convert(args.source, args.destination, args.cell_size, not args.unpacked, args.compress)
+    return 0
+
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
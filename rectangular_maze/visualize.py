@@ -0,0 +1,117 @@
+import pygame
+import numpy as np
+from .settings import init_display, DELAY, BLACK, FPS
+
+class PygameObserver:
+    """
+    Live visualization of the maze generation in the pygame window, attached to `build_maze` as an observer.
+    Every step of the generation is drawn on the screen and captured in memory as a frame of the generation GIF.
+
+    Attributes:
+        CELL_SIZE (int): The size of each cell on the screen in pixels.
+        screen (pygame.Surface): The Pygame window.
+        clock (pygame.time.Clock): The Pygame clock controlling the frame rate.
+        frames (list or FrameWriter): The sink the captured frames are appended to.
+        previous_cell (Cell): The cell visited at the previous step.
+    """
+    def __init__(self, CELL_SIZE, WIDTH_CELL_COUNT, HEIGHT_CELL_COUNT, frames=None):
+        """
+        Initialize the observer and open the Pygame window with the size of the maze.
+
+        Parameters:
+        CELL_SIZE (int): The size of each cell on the screen in pixels.
+        WIDTH_CELL_COUNT (int): The number of cells horizontally in the maze.
+        HEIGHT_CELL_COUNT (int): The number of cells vertically in the maze.
+        frames (list or FrameWriter): The sink the captured frames, (height, width, 3) uint8 RGB arrays, are 
+                                      appended to. A FrameWriter streams them to a file. Default is a new list.
+        """
+        self.CELL_SIZE = CELL_SIZE
+        self.screen, self.clock = init_display(WIDTH_CELL_COUNT * CELL_SIZE, HEIGHT_CELL_COUNT * CELL_SIZE)
+        self.frames = [] if frames is None else frames
+        self.previous_cell = None
+
+    def step(self, grid, current_cell, next_cell=None):
+        """
+        Draw a single step of the generation. Only the cells that changed during the step are repainted.
+
+        Parameters:
+        grid (2D list of Cell): The maze being generated.
+        current_cell (Cell): The cell currently being visited.
+        next_cell (Cell): The neighbour the current cell was connected to, None when backtracking. Default is None.
+
+        Returns:
+        running (bool): False if the pygame window has been closed, True otherwise.
+        """
+        self.clock.tick(FPS)  # Limit the frame rate to make the visualization smoother
+
+        # Handle the event of closing the window
+        running = True
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+        pygame.time.delay(DELAY)  # Add a delay to visualize the maze generation process
+
+        # The previous current cell, the current cell and the neighbour whose wall was removed changed,
+        # the whole grid is drawn on the first step
+        if self.previous_cell is None:
+            self.draw(grid)
+        else:
+            self.draw(grid, [self.previous_cell, current_cell, next_cell])
+        self.previous_cell = current_cell
+        return running
+
+    def finish(self, grid, start, end):
+        """
+        Draw the final maze once the entrance and exit have been created.
+
+        Parameters:
+        grid (2D list of Cell): The generated maze.
+        start (Cell): The starting point (entrance) of the maze.
+        end (Cell): The ending point (exit) of the maze.
+        """
+        self.draw(grid, [self.previous_cell, start, end])
+
+    def draw(self, grid, cells=None):
+        """
+        Draw the cells on the screen, update the changed part of the display and capture the screen as a frame.
+
+        Each cell only owns the pixels of its own rectangle (walls drawn on the right and bottom edges are painted
+        over by the neighbouring cells), so a cell is repainted with drawing clipped to its rectangle and the 
+        result is the same as redrawing the whole grid.
+
+        Parameters:
+        grid (2D list of Cell): The maze being generated.
+        cells (list of Cell): The cells that changed, None entries are ignored. Default is None (every cell).
+        """
+        if cells is None:
+            self.screen.fill(BLACK)  # Fill the screen with black color
+
+            # Draw each cell on the screen
+            for row in grid:
+                for cell in row:
+                    cell.draw(self.CELL_SIZE, self.screen)
+
+            pygame.display.flip()  # Update the full display surface to the screen
+        else:
+            rects = []
+            for cell in set(cell for cell in cells if cell is not None):
+                rect = pygame.Rect(cell.x * self.CELL_SIZE, cell.y * self.CELL_SIZE, self.CELL_SIZE, self.CELL_SIZE)
+                self.screen.set_clip(rect)
+                self.screen.fill(BLACK, rect)
+                cell.draw(self.CELL_SIZE, self.screen)
+                rects.append(rect)
+            self.screen.set_clip(None)
+
+            pygame.display.update(rects)  # Only update the repainted cells on the screen
+
+        # Capture each frame of the maze generation process as an RGB array
+        width, height = self.screen.get_size()
+        frame = np.frombuffer(pygame.image.tobytes(self.screen, "RGB"), dtype=np.uint8).reshape(height, width, 3)
+        self.frames.append(frame)
+
+    def close(self):
+        """
+        Close the pygame window.
+        """
+        pygame.quit()
@@ -0,0 +1,37 @@
+import os
+import random
+import sys
+
+import cv2
+import pytest
+
+# The packages are imported from the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rectangular_maze.generate import build_maze
+from rectangular_maze.draw import draw_maze
+
+
+@pytest.fixture(scope="session")
+def maze():
+    """A 60x40 maze, with its start and end cells."""
+    return build_maze(60, 40, rng=random.Random(1))
+
+
+@pytest.fixture(scope="session")
+def render(maze, tmp_path_factory):
+    """A clean render of the maze, with 8 pixel cells."""
+    grid, start, end = maze
+    filename = str(tmp_path_factory.mktemp("renders") / "maze.png")
+    draw_maze(grid, start, end, filename=filename, cell_size=8)
+    return filename
+
+
+@pytest.fixture(scope="session")
+def blurred(render, tmp_path_factory):
+    """The render scaled and blurred, so it is not a clean render and walls need edge detection."""
+    image = cv2.imread(render)
+    image = cv2.GaussianBlur(cv2.resize(image, None, fx=1.37, fy=1.37), (5, 5), 1.5)
+    filename = str(tmp_path_factory.mktemp("renders") / "blurred.png")
+    cv2.imwrite(filename, image)
+    return filename
@@ -0,0 +1,67 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from preprocess.bands import BandedMaze, RowReader
+
+
+@pytest.mark.parametrize("cache_bytes", [0, 256 << 20])
+def test_auto_mode_reads_canny_bands_of_streamed_images(blurred, cache_bytes):
+    # The auto check must not drop the rows the first Canny band starts at
+    with BandedMaze(blurred, 8, mode='auto', cache_bytes=cache_bytes) as banded:
+        assert banded.mode == 'canny'
+        maze = banded.to_maze()
+    assert maze.walls.shape == (40, 60)
+
+
+def test_auto_mode_with_known_geometry(blurred):
+    with BandedMaze(blurred, 8, mode='auto') as banded:
+        geometry = banded.geometry
+        expected = banded.to_maze().walls
+    with BandedMaze(blurred, 8, mode='auto', geometry=geometry) as banded:
+        assert banded.mode == 'canny'
+        assert np.array_equal(banded.to_maze().walls, expected)
+
+
+def _gray_16_bit(image, filename):
+    cv2.imwrite(filename, cv2.cvtColor(image, cv2.COLOR_BGR2GRAY).astype(np.uint16) * 257)
+
+
+def _black_and_white(image, filename):
+    Image.fromarray(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)).convert("1").save(filename)
+
+
+@pytest.mark.parametrize("convert", [_gray_16_bit, _black_and_white])
+def test_png_files_that_cannot_be_streamed(render, tmp_path, convert):
+    # 16-bit and 1-bit PNG files are decoded as a whole instead of streamed, and give the same walls
+    filename = str(tmp_path / "converted.png")
+    convert(cv2.imread(render), filename)
+    with RowReader(filename) as reader:
+        assert not reader.streamed
+        assert (reader.height, reader.width) == cv2.imread(render).shape[:2]
+    with BandedMaze(render, 8, mode='auto') as banded:
+        expected = banded.to_maze().walls
+    with BandedMaze(filename, 8, mode='auto') as banded:
+        assert np.array_equal(banded.to_maze().walls, expected)
+
+
+def test_chunk_lists_are_read_forward():
+    image = np.arange(1000 * 7, dtype=np.uint8).reshape(1000, 7)
+    with RowReader([image[top:top + 256] for top in range(0, 1000, 256)]) as reader:
+        assert (reader.height, reader.width) == (1000, 7)
+        for start, stop in ((0, 100), (100, 256), (200, 600), (590, 1200)):
+            assert np.array_equal(reader.read(start, stop), image[start:stop])
+        with pytest.raises(ValueError):
+            reader.read(0, 10)
+
+
+@pytest.mark.parametrize("mode", ['threshold', 'canny'])
+def test_first_pass_cache_gives_the_same_walls(render, mode):
+    with BandedMaze(cv2.imread(render), 8, mode=mode) as banded:
+        expected = banded.to_maze().walls
+    for cache_bytes in (0, 1 << 10, 64 << 20):
+        with BandedMaze(render, 8, mode=mode, cache_bytes=cache_bytes) as banded:
+            # The bands are read from the kept chunks only when the whole image fit in the cache
+            assert banded.reader.streamed == (cache_bytes < 64 << 20)
+            assert np.array_equal(banded.to_maze().walls, expected)
@@ -0,0 +1,11 @@
+import pytest
+
+from preprocess.batch import solve_batch
+
+
+@pytest.mark.parametrize("chunk_size", [0, -3, 2])
+def test_every_image_is_solved_whatever_the_chunk_size(render, chunk_size):
+    paths = [render] * 3
+    results = list(solve_batch(paths, workers=1, chunk_size=chunk_size))
+    assert [result['file'] for result in results] == paths
+    assert all(result['ok'] for result in results)
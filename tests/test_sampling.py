@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from rectangular_maze.draw import draw_maze
+from preprocess.pipeline import solve_image
+from preprocess.sampling import shade
+
+
+def test_saturated_colors_are_background():
+    # Black, white, the green and blue markers and the red path of draw_maze (BGR), a gray anti-aliased pixel
+    pixels = np.array([[[0, 0, 0], [255, 255, 255], [113, 179, 60], [237, 149, 100], [97, 105, 255],
+                        [128, 128, 128]]], dtype=np.uint8)
+    assert shade(pixels).tolist() == [[240, 0, 0, 0, 0, 112]]
+
+
+@pytest.mark.parametrize("cell_size", [3, 4])
+def test_markers_do_not_close_the_entrance(maze, tmp_path, cell_size):
+    # On small cells the markers cover the grid lines, they must not be read as walls
+    grid, start, end = maze
+    filename = str(tmp_path / "maze.png")
+    draw_maze(grid, start, end, filename=filename, cell_size=cell_size)
+    result = solve_image(filename, mode='threshold')
+    assert result['path'] is not None
+    assert (result['path'][0].x, result['path'][0].y) == (start.x, start.y)
+    assert (result['path'][-1].x, result['path'][-1].y) == (end.x, end.y)